@@ -180,6 +180,10 @@ LOGGING = {
 # Celery
 
 BROKER_URL = 'redis://localhost:6379/0'
+CELERY_RESULT_BACKEND = BROKER_URL
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
 
 djcelery.setup_loader()
 
@@ -195,3 +199,66 @@ MAX_AMAZON_ITEM_PRICE = 1000
 MIN_AMAZON_ITEM_REVIEW_COUNT = 1
 MAX_AMAZON_ITEM_REVIEW_COUNT = 1000
 EBAY_ITEM_PERCENTAGE_MARKUP = 1.5
+
+REDIS_URL = BROKER_URL
+
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 16
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+HTTP_RETRY_COUNT = 3
+HTTP_RETRY_BACKOFF_FACTOR = 0.5
+
+AMAZON_API_RATE = 1
+AMAZON_API_BURST = 1
+AMAZON_API_COALESCE_TIMEOUT = 30
+AMAZON_API_COALESCE_LOCK_TIMEOUT = 5
+AMAZON_API_COALESCE_WINDOW = 60
+
+AMAZON_SEARCH_INDEX = 'All'
+AMAZON_SEARCH_ORDER = 'reverse'
+AMAZON_SEARCH_PAGE_SIZE = 10
+AMAZON_SEARCH_MAX_PAGES = 5
+AMAZON_SEARCH_FAN_OUT = 5
+AMAZON_LOOKUP_BATCH_SIZE = 10
+
+LIST_TASK_CHUNK_SIZE = 100
+REFRESH_TASK_CHUNK_SIZE = 500
+BULK_CREATE_BATCH_SIZE = 500
+BULK_UPDATE_BATCH_SIZE = 500
+
+EBAY_LIST_CONCURRENCY = 10
+EBAY_LIST_SLOT_TIMEOUT = 60 * 10
+EBAY_LIST_RETRY_DELAY = 5
+EBAY_HOURLY_CALL_LIMIT = 1000
+EBAY_DAILY_CALL_LIMIT = 5000
+
+IMAGE_PROBE_POOL_SIZE = 16
+IMAGE_PROBE_CONCURRENCY_PER_HOST = 8
+IMAGE_PROBE_RANGE_SIZE = 8192
+
+IMAGE_SIZE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+IMAGE_SIZE_CACHE_MAX_SIZE = 100000
+
+REVIEW_COUNT_PROVIDER = 'lister.utils.StreamReviewCountProvider'
+REVIEW_COUNT_CHUNK_SIZE = 4096
+REVIEW_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+REVIEW_COUNT_CACHE_MAX_SIZE = 100000
+
+CATEGORY_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+CATEGORY_CACHE_MAX_SIZE = 10000
+LISTING_TEMPLATE_NAME = 'lister/listing.html'
+LISTING_TEMPLATE_VERSION = 1
+LISTING_HTML_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+LISTING_HTML_CACHE_MAX_SIZE = 50000
+
+PAGINATOR_CACHE_NAME = 'paginator'
+PAGINATOR_CACHE_TIMEOUT = 60 * 5
+PAGINATOR_CACHE_MAX_SIZE = 10000
+PAGINATOR_EXACT_COUNT_THRESHOLD = 10000
+
+USE_LOCAL_CATEGORIES = True
+CATEGORY_INDEX_CHECK_INTERVAL = 60 * 5
+CATEGORY_SEARCH_LIMIT = 10
+CATEGORY_SEARCH_TIMEOUT = 10
+CATEGORY_SEARCH_SESSION_TASK_COUNT = 20
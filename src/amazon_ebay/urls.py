@@ -16,10 +16,20 @@ Including another URLconf
 from django.conf.urls import url
 from django.contrib import admin
 
-from lister.views import category_search_view
+from lister.views import (
+    category_search_view, category_result_view, category_cancel_view
+)
 
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
+    url(
+        r'^search/result/(?P<task_id>[0-9a-f-]+)/$', category_result_view,
+        name='category_result'
+    ),
+    url(
+        r'^search/cancel/(?P<task_id>[0-9a-f-]+)/$', category_cancel_view,
+        name='category_cancel'
+    ),
     url(r'^search/$', category_search_view, name='category_search'),
     url(
         r'^search/(?P<query>(.*)+)$', category_search_view,
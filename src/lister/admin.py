@@ -1,18 +1,24 @@
+import json
 import logging
+import time
 
+from celery import chord
 from import_export import resources
 from import_export.admin import ImportMixin
 
+from django.conf import settings
 from django.contrib import admin, messages
-from django.db import models
-from django.db.models import Case, When, Value, BooleanField
 from django.utils.safestring import mark_safe
 
 from .forms import (
     ChangeReviewerForm, EbayItemInlineForm, EbayItemInlineFormSet, EbayItemForm
 )
-from .models import AmazonSearch, AmazonItem, EbayItem
-from .tasks import search_task, list_task
+from .models import (
+    AmazonSearch, AmazonItem, EbayItem, STATUS_DRAFTED, STATUS_READY,
+    STATUS_ERROR
+)
+from .paginators import AmazonItemPaginator, KeysetPaginator
+from .tasks import search_task, search_total_task, refresh_task, list_task
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +33,18 @@ def get_message_bit(count, obj_name, obj_name_multiple=None):
     return '{} {}'.format(count, obj_name_multiple)
 
 
+def get_chunk_list(item_list, chunk_size):
+    return [
+        item_list[index:index + chunk_size]
+        for index in range(0, len(item_list), chunk_size)
+    ]
+
+
 class AmazonSearchResource(resources.ModelResource):
 
     class Meta:
         model = AmazonSearch
-        exclude = ['date_searched']
+        exclude = ['date_searched', 'result_count']
 
 
 class BoolFilter(admin.SimpleListFilter):
@@ -54,27 +67,6 @@ class IsSearchedFilter(BoolFilter):
     query = {'date_searched__isnull': False}
 
 
-class IsReadyFilter(BoolFilter):
-
-    title = 'is ready'
-    parameter_name = 'is_ready'
-    query = {'ebayitem__is_ready': True}
-
-
-class IsListedFilter(BoolFilter):
-
-    title = 'is listed'
-    parameter_name = 'is_listed'
-    query = {'ebayitem__is_listed': True}
-
-
-class HasErrorFilter(BoolFilter):
-
-    title = 'has error'
-    parameter_name = 'has_error'
-    query = {'ebayitem__error__isnull': False}
-
-
 class AmazonItemInline(admin.TabularInline):
 
     model = AmazonItem
@@ -118,7 +110,7 @@ class AmazonSearchAdmin(ImportMixin, admin.ModelAdmin):
     search_fields = ['query']
     actions = ['search_action']
     list_filter = [IsSearchedFilter, 'date_searched']
-    list_display = ['query', 'get_result_count', 'date_searched']
+    list_display = ['query', 'result_count', 'date_searched']
 
     def has_delete_permission(self, request, obj=None):
         pass
@@ -139,26 +131,27 @@ class AmazonSearchAdmin(ImportMixin, admin.ModelAdmin):
             request, object_id, *args, **kwargs
         )
 
-    def get_queryset(self, request):
-        queryset = super(AmazonSearchAdmin, self).get_queryset(request)
-        return queryset.annotate(models.Count('amazonitem'))
-
     def get_actions(self, request):
         actions = super(AmazonSearchAdmin, self).get_actions(request)
         if 'delete_selected' in actions:
             del actions['delete_selected']
         return actions
 
-    def get_result_count(self, obj):
-        return obj.amazonitem__count
-
-    get_result_count.short_description = 'result count'
-    get_result_count.admin_order_field = 'amazonitem__count'
-
     def search_action(self, request, queryset):
-        search_task.delay(queryset)
+        search_id_list = list(queryset.values_list('id', flat=True))
+        start = time.time()
+        chord(
+            search_task.s(search_id) for search_id in search_id_list
+        )(search_total_task.s(search_id_list))
+        logger.info(
+            'Enqueued {} search tasks with {} bytes of arguments in {:.3f}'
+            's'.format(
+                len(search_id_list), len(json.dumps(search_id_list)),
+                time.time() - start
+            )
+        )
         message = 'Searching for amazon {}'.format(
-            get_message_bit(queryset.count(), 'search', 'searches')
+            get_message_bit(len(search_id_list), 'search', 'searches')
         )
         logger.info(message)
         self.message_user(request, message, level=messages.SUCCESS)
@@ -177,7 +170,10 @@ class AmazonItemAdmin(admin.ModelAdmin):
     fieldsets = [[None, {'fields': readonly_fields + ['reviewer']}]]
     inlines = [EbayItemInline]
     action_form = ChangeReviewerForm
-    actions = ['list_action', 'change_reviewer_action']
+    paginator = AmazonItemPaginator
+    show_full_result_count = False
+    ordering = ['-date_added', '-id']
+    actions = ['list_action', 'refresh_action', 'change_reviewer_action']
 
     class Media:
         css = {'all': ['css/amazonitem_admin.css']}
@@ -190,7 +186,7 @@ class AmazonItemAdmin(admin.ModelAdmin):
         pass
 
     def lookup_allowed(self, key, *args, **kwargs):
-        if key in ['is_listed', 'reviewer', 'search__query', 'date_added']:
+        if key in ['reviewer', 'search__query', 'date_added']:
             return True
         return super(AmazonItemAdmin, self).lookup_allowed(
             key, *args, **kwargs
@@ -198,11 +194,10 @@ class AmazonItemAdmin(admin.ModelAdmin):
 
     def get_list_display(self, request):
         list_display = [
-            'title', 'get_url', 'get_price', 'get_is_ready',
-            'get_has_error', 'get_is_listed', 'reviewer', 'date_added'
+            'title', 'get_url', 'get_price', 'is_listable', 'status',
+            'reviewer', 'date_added'
         ]
         if not request.user.is_superuser:
-            list_display.remove('get_is_listed')
             list_display.remove('date_added')
             list_display.remove('reviewer')
         return list_display
@@ -215,20 +210,13 @@ class AmazonItemAdmin(admin.ModelAdmin):
     def get_list_filter(self, request):
         if request.user.is_superuser:
             return [
-                IsReadyFilter, HasErrorFilter, IsListedFilter, 'reviewer',
-                'search__query', 'date_added'
+                'is_listable', 'status', 'reviewer', 'search__query',
+                'date_added'
             ]
-        return [IsReadyFilter, HasErrorFilter]
+        return ['is_listable', 'status']
 
     def get_queryset(self, request):
         queryset = super(AmazonItemAdmin, self).get_queryset(request)
-        queryset = queryset.annotate(
-            has_error=Case(
-                When(ebayitem__error__isnull=0, then=Value(1)),
-                default=Value(0),
-                output_field=BooleanField()
-            )
-        )
         if not request.user.is_superuser:
             return queryset.filter(reviewer=request.user)
         return queryset
@@ -251,43 +239,47 @@ class AmazonItemAdmin(admin.ModelAdmin):
 
     get_image.short_description = 'image'
 
-    def get_is_listed(self, obj):
-        return bool(obj.get_related_ebay_item())
-
-    get_is_listed.boolean = True
-    get_is_listed.short_description = 'is listed'
-    get_is_listed.admin_order_field = 'ebayitem__is_listed'
-
-    def get_is_ready(self, obj):
-        try:
-            return obj.get_related_ebay_item().is_ready
-        except AttributeError:
-            return False
-
-    get_is_ready.boolean = True
-    get_is_ready.short_description = 'is ready'
-    get_is_ready.admin_order_field = 'ebayitem__is_ready'
-
-    def get_has_error(self, obj):
-        try:
-            return bool(obj.get_related_ebay_item().error)
-        except AttributeError:
-            return False
-
-    get_has_error.boolean = True
-    get_has_error.short_description = 'has error'
-    get_has_error.admin_order_field = 'has_error'
-
     def list_action(self, request, queryset):
-        queryset = queryset.filter(ebayitem__is_listed=False)
-        list_task.delay(queryset)
+        item_id_list = list(
+            queryset.filter(
+                status__in=[STATUS_DRAFTED, STATUS_READY, STATUS_ERROR],
+                is_listable=True
+            ).values_list('id', flat=True)
+        )
+        chunk_list = get_chunk_list(
+            item_id_list, settings.LIST_TASK_CHUNK_SIZE
+        )
+        start = time.time()
+        for chunk in chunk_list:
+            list_task.delay(chunk)
+        logger.info(
+            'Enqueued {} list tasks with {} bytes of arguments in {:.3f}'
+            's'.format(
+                len(chunk_list), len(json.dumps(chunk_list)),
+                time.time() - start
+            )
+        )
         message = 'Listing {}'.format(
-            get_message_bit(queryset.count(), 'Amazon item') + ' on Ebay'
+            get_message_bit(len(item_id_list), 'Amazon item') + ' on Ebay'
         )
         self.message_user(request, message, level=messages.SUCCESS)
 
     list_action.short_description = 'List selected amazon items on ebay'
 
+    def refresh_action(self, request, queryset):
+        item_id_list = list(queryset.values_list('id', flat=True))
+        for chunk in get_chunk_list(
+            item_id_list, settings.REFRESH_TASK_CHUNK_SIZE
+        ):
+            refresh_task.delay(chunk)
+        message = 'Refreshing {}'.format(
+            get_message_bit(len(item_id_list), 'Amazon item')
+        )
+        self.message_user(request, message, level=messages.SUCCESS)
+
+    refresh_action.short_description = 'Refresh price, images and reviews of '\
+        'selected amazon items'
+
     def change_reviewer_action(self, request, queryset):
         queryset.update(reviewer=request.POST.get('reviewer'))
         message = 'Changing reviewer for amazon {}'.format(
@@ -314,6 +306,9 @@ class EbayItemAdmin(admin.ModelAdmin):
     fieldsets = [[None, {'fields': fields_}]]
     readonly_fields = fields_ + ['html']
     form = EbayItemForm
+    paginator = KeysetPaginator
+    show_full_result_count = False
+    ordering = ['-id']
 
     def has_add_permission(self, request):
         pass
@@ -0,0 +1,51 @@
+import threading
+
+from django.utils.six.moves import BaseHTTPServer, socketserver
+
+
+class FixtureServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, handler_class):
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), handler_class
+        )
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    def get_url(self, path):
+        return 'http://{}:{}{}'.format(
+            self.server_address[0], self.server_address[1], path
+        )
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class FixtureRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body, content_type, status=200, header_dict=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (header_dict or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def get_percentile(value_list, percentile):
+    value_list = sorted(value_list)
+    if not value_list:
+        return 0
+    index = int(round((len(value_list) - 1) * percentile / 100.0))
+    return value_list[index]
@@ -5,6 +5,7 @@ from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.models import User
 
 from .models import EbayItem
+from .utils import ListingRenderer
 
 
 class ChangeReviewerForm(ActionForm):
@@ -83,7 +84,7 @@ class EbayItemInlineFormSet(forms.BaseInlineFormSet):
                 {
                     'title': amazon_item.title,
                     'price': amazon_item.get_price_markup(),
-                    'html': amazon_item.get_html(),
+                    'html': ListingRenderer().get_html(amazon_item),
                     'category_search': amazon_item.search.query,
                     'manufacturer': amazon_item.manufacturer,
                     'mpn': amazon_item.mpn
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from lister.models import (
+    AmazonItem, STATUS_NEW, STATUS_DRAFTED, STATUS_READY, STATUS_LISTED,
+    STATUS_ERROR
+)
+
+
+class Command(BaseCommand):
+
+    help = 'Populate the status of Amazon items from their Ebay items'
+
+    def handle(self, *args, **options):
+        queryset = AmazonItem.objects.all()
+        status_list = [
+            (STATUS_NEW, queryset.filter(ebayitem__isnull=True)),
+            (STATUS_DRAFTED, queryset.filter(ebayitem__isnull=False)),
+            (STATUS_READY, queryset.filter(ebayitem__is_ready=True)),
+            (STATUS_ERROR, queryset.filter(ebayitem__error__isnull=False)),
+            (STATUS_LISTED, queryset.filter(ebayitem__is_listed=True)),
+        ]
+        with transaction.atomic():
+            for status, status_queryset in status_list:
+                count = status_queryset.update(status=status)
+                self.stdout.write(
+                    'Marked {} Amazon items as {}'.format(count, status)
+                )
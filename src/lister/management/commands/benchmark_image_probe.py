@@ -0,0 +1,69 @@
+import re
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from django.core.management.base import BaseCommand
+
+from lister.benchmarks import FixtureServer, FixtureRequestHandler
+from lister.utils import ImageProber
+
+RANGE_PATTERN = re.compile(r'bytes=(\d+)-(\d*)')
+
+
+class ImageRequestHandler(FixtureRequestHandler):
+
+    data = b''
+
+    def do_GET(self):
+        match = RANGE_PATTERN.match(self.headers.get('Range') or '')
+        if not match:
+            self.send_body(self.data, 'image/jpeg')
+            return
+        start = int(match.group(1))
+        end = len(self.data) - 1
+        if match.group(2):
+            end = min(int(match.group(2)), end)
+        self.send_body(
+            self.data[start:end + 1], 'image/jpeg', 206, {
+                'Content-Range': 'bytes {}-{}/{}'.format(
+                    start, end, len(self.data)
+                )
+            }
+        )
+
+
+class Command(BaseCommand):
+
+    help = 'Compare ranged and full image size probing against a local server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100)
+        parser.add_argument('--size', type=int, default=1000)
+
+    def get_image_data(self, size):
+        image = Image.effect_noise((size, size), 64).convert('RGB')
+        stream = BytesIO()
+        image.save(stream, 'JPEG', quality=90)
+        return stream.getvalue()
+
+    def handle(self, *args, **options):
+        ImageRequestHandler.data = self.get_image_data(options['size'])
+        self.stdout.write('Serving a {} byte {}x{} JPEG'.format(
+            len(ImageRequestHandler.data), options['size'], options['size']
+        ))
+        with FixtureServer(ImageRequestHandler) as server:
+            for mode in ['ranged', 'full']:
+                prober = ImageProber()
+                probe = prober.get_size if mode == 'ranged' else \
+                    prober.get_full_size
+                start = time.time()
+                for index in range(options['count']):
+                    probe(server.get_url('/{}/{}.jpg'.format(mode, index)))
+                self.stdout.write(
+                    '{}: {} bytes in {:.3f}s for {} images'.format(
+                        mode, prober.byte_count, time.time() - start,
+                        options['count']
+                    )
+                )
@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from lister.models import AmazonItem
+from lister.utils import Cache, ListingRenderer
+
+
+def get_concatenated_html(title, feature_list):
+    html = '<div id="ds_div"><h1 class="p1" style="text-align: center;"><span'\
+        ' class="s1"><strong>{}</strong></span></h1><h1 class="p2" style="tex'\
+        't-align: center;"><span class="s1"><strong>Product Description:</str'\
+        'ong></span></h1><h2><strong>&lt; Insert Description Here &gt;</stron'\
+        'g></h2><h2>&nbsp;</h2><h2 class="p2"><span class="s1">Features:</spa'\
+        'n></h2><ul class="ul1">'.format(title)
+    for feature in json.loads(feature_list):
+        html += '<li class="li3"><span class="s1">{}</span></li>'.format(
+            feature
+        )
+    return html + '</ul><br></br><h2>Shipping / Return Policies (Balanced):</'\
+        'h2><h3>Shipping Policies:</h3><ul><li>We ship to the Lower 48 States'\
+        ' only (Does NOT include Hawaii or Alaska)</li><li>We cannot ship to '\
+        'PO Boxes/APO\'s</li><li>We cannot combine shipping.</li><li>No Local'\
+        ' Pickup.</li></ul><p>All items will be shipped directly to you from '\
+        'our supplier within 1-3 business days. Most items are delivered with'\
+        'in 3-5 business days, however, please allow 3-10 business days.</p><'\
+        'p>All items are in stock when they are listed. Inventory is tracked '\
+        'and updated regularly. However, if demand exceeds our supply, we wil'\
+        'l give the customer the following options: Full refund. Have the ite'\
+        'm back ordered and shipped when it becomes available. We will offer '\
+        'other items in similar style and quality. Your bid / purchase of the'\
+        ' item implies you agree to this policy.</p><p>If you have a question'\
+        ' about a product not otherwise answered in the item description, ple'\
+        'ase contact us via eBay messages first and allow us the opportunity '\
+        'to help you and be sure we have what you\'re looking for.</p><h3>Exc'\
+        'hange/Return Policy:</h3><p>Your satisfaction is guaranteed! If for '\
+        'any reason you are unhappy with your item, just return it within 14 '\
+        'days for a full refund, minus shipping cost. Please contact us prior'\
+        ' to initiating a return so that we can issue you a refund authorizat'\
+        'ion.</p><h3>Payment Policy</h3><p>We require Immediate Payment. Must'\
+        ' be an authorized address.</p></div><p>Thank you for viewing the {}<'\
+        '/p>'.format(title).encode('utf-8')
+
+
+class Command(BaseCommand):
+
+    help = 'Compare listing html rendering against string concatenation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000)
+        parser.add_argument('--feature-count', type=int, default=5)
+
+    def write_time(self, name, start, count):
+        self.stdout.write('{}: {:.3f}s for {} items'.format(
+            name, time.time() - start, count
+        ))
+
+    def handle(self, *args, **options):
+        count = options['count']
+        feature_list = json.dumps([
+            'Feature {} with <b>markup</b> & details'.format(index)
+            for index in range(options['feature_count'])
+        ])
+        item_obj_list = [
+            AmazonItem(
+                id=index + 1, title='Item {}'.format(index),
+                feature_list=feature_list
+            ) for index in range(count)
+        ]
+        start = time.time()
+        for item_obj in item_obj_list:
+            get_concatenated_html(item_obj.title, item_obj.feature_list)
+        self.write_time('concatenation', start, count)
+        renderer = ListingRenderer()
+        renderer.cache = Cache('listing_html_benchmark', 60, count)
+        start = time.time()
+        for item_obj in item_obj_list:
+            renderer.render(item_obj)
+        self.write_time('template', start, count)
+        start = time.time()
+        renderer.render_many(item_obj_list)
+        self.write_time('cold cache', start, count)
+        start = time.time()
+        renderer.render_many(item_obj_list)
+        self.write_time('warm cache', start, count)
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from lister.benchmarks import FixtureServer, FixtureRequestHandler
+from lister.utils import SoupReviewCountProvider, StreamReviewCountProvider
+
+
+class PageRequestHandler(FixtureRequestHandler):
+
+    page_list = []
+
+    def do_GET(self):
+        index = int(self.path.strip('/').split('/')[-1])
+        self.send_body(self.page_list[index], 'text/html; charset=utf-8')
+
+
+class Command(BaseCommand):
+
+    help = 'Compare review count extraction over saved Amazon review pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('page_path', nargs='+')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        page_list = []
+        for path in options['page_path']:
+            with open(path, 'rb') as page_file:
+                page_list.append(page_file.read())
+        PageRequestHandler.page_list = page_list
+        with FixtureServer(PageRequestHandler) as server:
+            for provider_class in [
+                SoupReviewCountProvider, StreamReviewCountProvider
+            ]:
+                provider = provider_class()
+                count_list = []
+                start = time.time()
+                for _ in range(options['repeat']):
+                    count_list = [
+                        provider.fetch_review_count(
+                            server.get_url('/{}'.format(index))
+                        ) for index in range(len(page_list))
+                    ]
+                self.stdout.write(
+                    '{}: {:.3f}s for {} pages, counts {}'.format(
+                        provider_class.__name__, time.time() - start,
+                        len(page_list) * options['repeat'], count_list
+                    )
+                )
@@ -0,0 +1,80 @@
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from lister.models import AmazonSearch, AmazonItem, EbayItem, STATUS_READY
+
+AMAZON_ITEM_SQL = '''
+INSERT INTO lister_amazonitem (
+    search_id, reviewer_id, url, title, feature_list, image_list, price,
+    review_count, date_added, status
+)
+SELECT
+    %s, CASE WHEN i %% 10 = 0 THEN %s END, %s || i, 'Item ' || i, '[]',
+    '[]', 10, 10, now() - i * interval '1 second',
+    CASE WHEN i %% 10 < 3 THEN 'drafted' ELSE 'new' END
+FROM generate_series(1, %s) AS i
+'''
+
+EBAY_ITEM_SQL = '''
+INSERT INTO lister_ebayitem (
+    item_id, title, price, html, category_search, category_id,
+    category_name, manufacturer, mpn, is_ready, is_listed, error
+)
+SELECT
+    id, title, price, '', '', 1, '', '', '', id %% 3 = 0, id %% 5 = 0,
+    CASE WHEN id %% 50 = 0 THEN 'Error' END
+FROM lister_amazonitem
+WHERE search_id = %s AND status = 'drafted'
+'''
+
+
+class Command(BaseCommand):
+
+    help = 'Explain the admin filter queries over a synthetic data set that '\
+        'is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000)
+        parser.add_argument('--analyze', action='store_true', default=False)
+
+    def explain(self, name, queryset, analyze):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN {}{}'.format('ANALYZE ' if analyze else '', sql),
+                params
+            )
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.stdout.write('{}\n{}\n'.format(name, plan))
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username=uuid.uuid4().hex)
+            search_obj = AmazonSearch.objects.create(query='explain')
+            with connection.cursor() as cursor:
+                cursor.execute(AMAZON_ITEM_SQL, [
+                    search_obj.id, user.id,
+                    'http://explain/{}/'.format(uuid.uuid4().hex),
+                    options['count']
+                ])
+                cursor.execute(EBAY_ITEM_SQL, [search_obj.id])
+                cursor.execute('ANALYZE lister_amazonitem')
+                cursor.execute('ANALYZE lister_ebayitem')
+            item_queryset = AmazonItem.objects.order_by('-date_added', '-id')
+            for name, queryset in [
+                ('is ready', item_queryset.filter(ebayitem__is_ready=True)),
+                ('is listed', item_queryset.filter(ebayitem__is_listed=True)),
+                ('has error', item_queryset.filter(
+                    ebayitem__error__isnull=False
+                )),
+                ('reviewer', item_queryset.filter(reviewer=user)),
+                ('status', item_queryset.filter(status=STATUS_READY)),
+                ('listed ebay items', EbayItem.objects.filter(
+                    is_listed=True
+                ).order_by('-id')),
+            ]:
+                self.explain(name, queryset[:100], options['analyze'])
+            transaction.set_rollback(True)
@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+
+from celery.signals import task_prerun
+from ebaysdk.trading import Connection as Trading
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from lister import utils
+from lister.benchmarks import (
+    FixtureServer, FixtureRequestHandler, get_percentile
+)
+from lister.tasks import category_search_task
+
+SUGGESTED_CATEGORIES_RESPONSE = '<?xml version="1.0" encoding="UTF-8"?><GetS'\
+    'uggestedCategoriesResponse xmlns="urn:ebay:apis:eBLBaseComponents"><Ack'\
+    '>Success</Ack><Version>837</Version><SuggestedCategoryArray><SuggestedC'\
+    'ategory><Category><CategoryID>1</CategoryID><CategoryName>Stub</Categor'\
+    'yName></Category><PercentItemFound>100</PercentItemFound></SuggestedCat'\
+    'egory></SuggestedCategoryArray><CategoryCount>1</CategoryCount></GetSug'\
+    'gestedCategoriesResponse>'.encode('utf-8')
+
+
+class EbayRequestHandler(FixtureRequestHandler):
+
+    latency = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.latency)
+        self.send_body(SUGGESTED_CATEGORIES_RESPONSE, 'text/xml')
+
+
+class Command(BaseCommand):
+
+    help = 'Load test the category search endpoint and its polling against '\
+        'a stub Ebay API served to in-process Celery workers. Calls are '\
+        'charged to the sandbox call budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--latency', type=float, default=0.5)
+        parser.add_argument('--cached-ratio', type=float, default=0.8)
+        parser.add_argument('--poll-interval', type=float, default=0.05)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def connect(self, **kwargs):
+        if getattr(utils.ebay_connection_local, 'sandbox', None) is None:
+            utils.ebay_connection_local.sandbox = Trading(
+                domain='{}:{}'.format(*self.server.server_address),
+                https=False, devid='stub', appid='stub', certid='stub',
+                token='stub', config_file=None
+            )
+
+    def get_json(self, client, path):
+        response = client.get(
+            path, HTTP_HOST='localhost', HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        return json.loads(response.content.decode('utf-8'))
+
+    def search(self, query):
+        client = Client()
+        client.force_login(self.user)
+        start = time.time()
+        data = self.get_json(client, '/search/{}'.format(query))
+        while data['status'] == 'pending':
+            if time.time() - start > self.timeout:
+                return 'timeout', time.time() - start
+            time.sleep(self.poll_interval)
+            data = self.get_json(
+                client, '/search/result/{}/'.format(data['task_id'])
+            )
+        return data['status'], time.time() - start
+
+    def start_workers(self, count, queue):
+        app = category_search_task.app
+        worker_list = []
+        for index in range(count):
+            worker = app.WorkController(
+                pool_cls='solo', concurrency=1, queues=[queue],
+                hostname='load-test-{}-{}'.format(index, queue)
+            )
+            thread = threading.Thread(target=worker.start)
+            thread.daemon = True
+            thread.start()
+            worker_list.append(worker)
+        return worker_list
+
+    def handle(self, *args, **options):
+        EbayRequestHandler.latency = options['latency']
+        self.poll_interval = options['poll_interval']
+        self.timeout = options['timeout']
+        queue = 'load_test_{}'.format(uuid.uuid4().hex)
+        category_search_task.app.conf.CELERY_ROUTES = {
+            category_search_task.name: {'queue': queue}
+        }
+        cached_query = 'zz{}'.format(uuid.uuid4().hex)
+        query_list = []
+        for index in range(options['requests']):
+            if index % 100 < options['cached_ratio'] * 100:
+                query_list.append(('cached', cached_query))
+            else:
+                query_list.append(
+                    ('uncached', 'zz{}'.format(uuid.uuid4().hex))
+                )
+        self.user = User.objects.create(
+            username='load-test-{}'.format(uuid.uuid4().hex[:8]),
+            is_staff=True
+        )
+        task_prerun.connect(self.connect)
+        worker_list = []
+        try:
+            with override_settings(
+                USE_SANDBOX=True, USE_LOCAL_CATEGORIES=False
+            ), FixtureServer(EbayRequestHandler) as server:
+                self.server = server
+                worker_list = self.start_workers(options['workers'], queue)
+                self.search(cached_query)
+                pool = ThreadPool(options['concurrency'])
+                try:
+                    start = time.time()
+                    result_list = pool.map(
+                        self.search, [query for _, query in query_list]
+                    )
+                    total = time.time() - start
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            for worker in worker_list:
+                worker.stop()
+            task_prerun.disconnect(self.connect)
+            self.user.delete()
+        self.stdout.write(
+            '{} searches in {:.3f}s with {} clients and {} workers'.format(
+                len(result_list), total, options['concurrency'],
+                options['workers']
+            )
+        )
+        for kind in ['cached', 'uncached']:
+            kind_list = [
+                result for (query_kind, _), result in zip(
+                    query_list, result_list
+                ) if query_kind == kind
+            ]
+            duration_list = [duration for _, duration in kind_list]
+            self.stdout.write(
+                '{}: {} searches, {} not done, p50 {:.1f}ms, p99 {:.1f}'
+                'ms'.format(
+                    kind, len(kind_list),
+                    sum(1 for status, _ in kind_list if status != 'done'),
+                    get_percentile(duration_list, 50) * 1000,
+                    get_percentile(duration_list, 99) * 1000
+                )
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from lister.utils import reconcile_result_counts
+
+
+class Command(BaseCommand):
+
+    help = 'Recount the Amazon items of each Amazon search'
+
+    def handle(self, *args, **options):
+        count = reconcile_result_counts()
+        self.stdout.write(
+            'Corrected {} Amazon search result counts'.format(count)
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lister.utils import Ebay
+
+
+class Command(BaseCommand):
+
+    help = 'Download the Ebay category tree into the local category table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true', default=False,
+            help='Download the tree even if the category version is unchanged'
+        )
+
+    def handle(self, *args, **options):
+        ebay = Ebay()
+        if not ebay.connection:
+            raise CommandError('Failed to establish Ebay API connection')
+        count = ebay.sync_categories(force=options['force'])
+        self.stdout.write('Synced {} Ebay categories'.format(count))
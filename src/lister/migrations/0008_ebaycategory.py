@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-24 14:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0007_auto_20160117_2301'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EbayCategory',
+            fields=[
+                ('category_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.IntegerField(db_index=True)),
+                ('name', models.TextField()),
+                ('level', models.PositiveSmallIntegerField()),
+                ('is_leaf', models.BooleanField(default=False)),
+                ('version', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'ebay categories',
+            },
+        ),
+    ]
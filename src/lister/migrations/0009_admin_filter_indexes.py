@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-24 15:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0008_ebaycategory'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX lister_amazonitem_reviewer_date_added_idx '
+            'ON lister_amazonitem (reviewer_id, date_added)',
+            'DROP INDEX lister_amazonitem_reviewer_date_added_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX lister_ebayitem_listed_idx '
+            'ON lister_ebayitem (item_id) WHERE is_listed',
+            'DROP INDEX lister_ebayitem_listed_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX lister_ebayitem_ready_unlisted_idx '
+            'ON lister_ebayitem (item_id) WHERE is_ready AND NOT is_listed',
+            'DROP INDEX lister_ebayitem_ready_unlisted_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX lister_ebayitem_error_idx '
+            'ON lister_ebayitem (item_id) WHERE error IS NOT NULL',
+            'DROP INDEX lister_ebayitem_error_idx',
+        ),
+    ]
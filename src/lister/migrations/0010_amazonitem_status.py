@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-24 16:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0009_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amazonitem',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('drafted', 'Drafted'), ('ready', 'Ready'), ('listed', 'Listed'), ('error', 'Error')], db_index=True, default='new', max_length=7),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-24 17:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0010_amazonitem_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amazonsearch',
+            name='result_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunSQL(
+            'UPDATE lister_amazonsearch SET result_count = ('
+            'SELECT COUNT(*) FROM lister_amazonitem '
+            'WHERE lister_amazonitem.search_id = lister_amazonsearch.id)',
+            migrations.RunSQL.noop,
+        ),
+    ]
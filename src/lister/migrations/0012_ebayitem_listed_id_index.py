@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-24 18:20
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0011_amazonsearch_result_count'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX lister_ebayitem_listed_id_idx '
+            'ON lister_ebayitem (id) WHERE is_listed',
+            'DROP INDEX lister_ebayitem_listed_id_idx',
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-25 10:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0012_ebayitem_listed_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amazonitem',
+            name='is_listable',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-25 11:30
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0013_amazonitem_is_listable'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'DROP INDEX lister_ebayitem_ready_unlisted_idx',
+            'CREATE INDEX lister_ebayitem_ready_unlisted_idx '
+            'ON lister_ebayitem (item_id) WHERE is_ready AND NOT is_listed',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX lister_ebayitem_ready_idx '
+            'ON lister_ebayitem (item_id) WHERE is_ready',
+            'DROP INDEX lister_ebayitem_ready_idx',
+        ),
+    ]
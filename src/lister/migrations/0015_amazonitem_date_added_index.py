@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-25 12:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0014_ebayitem_ready_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX lister_amazonitem_date_added_id_idx '
+            'ON lister_amazonitem (date_added, id)',
+            'DROP INDEX lister_amazonitem_date_added_id_idx',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2016-01-25 15:30
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lister', '0015_amazonitem_date_added_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'UPDATE lister_amazonitem SET status = CASE '
+            "WHEN lister_ebayitem.is_listed THEN 'listed' "
+            "WHEN lister_ebayitem.error IS NOT NULL THEN 'error' "
+            "WHEN lister_ebayitem.is_ready THEN 'ready' "
+            "ELSE 'drafted' END "
+            'FROM lister_ebayitem '
+            'WHERE lister_ebayitem.item_id = lister_amazonitem.id',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -11,41 +11,18 @@ from django.utils.encoding import python_2_unicode_compatible
 
 logger = logging.getLogger(__name__)
 
-
-def get_html(title, feature_list):
-    html = '<div id="ds_div"><h1 class="p1" style="text-align: center;"><span'\
-        ' class="s1"><strong>{}</strong></span></h1><h1 class="p2" style="tex'\
-        't-align: center;"><span class="s1"><strong>Product Description:</str'\
-        'ong></span></h1><h2><strong>&lt; Insert Description Here &gt;</stron'\
-        'g></h2><h2>&nbsp;</h2><h2 class="p2"><span class="s1">Features:</spa'\
-        'n></h2><ul class="ul1">'.format(title)
-    for feature in json.loads(feature_list):
-        html += '<li class="li3"><span class="s1">{}</span></li>'.format(
-            feature
-        )
-    return html + '</ul><br></br><h2>Shipping / Return Policies (Balanced):</'\
-        'h2><h3>Shipping Policies:</h3><ul><li>We ship to the Lower 48 States'\
-        ' only (Does NOT include Hawaii or Alaska)</li><li>We cannot ship to '\
-        'PO Boxes/APO\'s</li><li>We cannot combine shipping.</li><li>No Local'\
-        ' Pickup.</li></ul><p>All items will be shipped directly to you from '\
-        'our supplier within 1-3 business days. Most items are delivered with'\
-        'in 3-5 business days, however, please allow 3-10 business days.</p><'\
-        'p>All items are in stock when they are listed. Inventory is tracked '\
-        'and updated regularly. However, if demand exceeds our supply, we wil'\
-        'l give the customer the following options: Full refund. Have the ite'\
-        'm back ordered and shipped when it becomes available. We will offer '\
-        'other items in similar style and quality. Your bid / purchase of the'\
-        ' item implies you agree to this policy.</p><p>If you have a question'\
-        ' about a product not otherwise answered in the item description, ple'\
-        'ase contact us via eBay messages first and allow us the opportunity '\
-        'to help you and be sure we have what you\'re looking for.</p><h3>Exc'\
-        'hange/Return Policy:</h3><p>Your satisfaction is guaranteed! If for '\
-        'any reason you are unhappy with your item, just return it within 14 '\
-        'days for a full refund, minus shipping cost. Please contact us prior'\
-        ' to initiating a return so that we can issue you a refund authorizat'\
-        'ion.</p><h3>Payment Policy</h3><p>We require Immediate Payment. Must'\
-        ' be an authorized address.</p></div><p>Thank you for viewing the {}<'\
-        '/p>'.format(title).encode('utf-8')
+STATUS_NEW = 'new'
+STATUS_DRAFTED = 'drafted'
+STATUS_READY = 'ready'
+STATUS_LISTED = 'listed'
+STATUS_ERROR = 'error'
+STATUS_CHOICES = [
+    (STATUS_NEW, 'New'),
+    (STATUS_DRAFTED, 'Drafted'),
+    (STATUS_READY, 'Ready'),
+    (STATUS_LISTED, 'Listed'),
+    (STATUS_ERROR, 'Error'),
+]
 
 
 @python_2_unicode_compatible
@@ -53,6 +30,7 @@ class AmazonSearch(models.Model):
 
     query = models.CharField(max_length=100)
     date_searched = models.DateTimeField(null=True, blank=True)
+    result_count = models.PositiveIntegerField(default=0, db_index=True)
 
     class Meta:
         verbose_name_plural = 'amazon searches'
@@ -75,6 +53,11 @@ class AmazonItem(models.Model):
     mpn = models.TextField(null=True, blank=True)
     review_count = models.PositiveIntegerField(verbose_name='reviews')
     date_added = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default=STATUS_NEW,
+        db_index=True
+    )
+    is_listable = models.BooleanField(default=True, db_index=True)
 
     def get_url(self):
         return '<a href="{0}" target="_blank">{0}</a>'.format(self.url)
@@ -104,9 +87,6 @@ class AmazonItem(models.Model):
 
     get_feature_list.short_description = 'features'
 
-    def get_html(self):
-        return get_html(self.title, self.feature_list)
-
     def get_image(self):
         return '<img src="{}" />'.format(json.loads(self.image_list)[0])
 
@@ -116,17 +96,10 @@ class AmazonItem(models.Model):
     def get_related_ebay_item(self):
         return self.ebayitem_set.first()
 
-    def is_valid(self):
-        image_list = json.loads(self.image_list)
-        if len(image_list) < settings.MIN_AMAZON_ITEM_IMAGE_COUNT:
-            logger.info(
-                'Less than minimum item image count {} for item {} with image '
-                'count of {}'.format(
-                    settings.MIN_AMAZON_ITEM_IMAGE_COUNT, self.title,
-                    len(image_list)
-                )
-            )
-            return
+    def get_asin(self):
+        return self.url.rstrip('/').split('/')[-1]
+
+    def is_valid_price(self):
         if self.price < settings.MIN_AMAZON_ITEM_PRICE:
             logger.info(
                 'Less than minimum amazon item price {} for item {} with price'
@@ -137,12 +110,15 @@ class AmazonItem(models.Model):
             return
         if self.price > settings.MAX_AMAZON_ITEM_PRICE:
             logger.info(
-                'More than minimum amazon item price {} for item {} with price'
+                'More than maximum amazon item price {} for item {} with price'
                 ' {}'.format(
-                    settings.MIN_AMAZON_ITEM_PRICE, self.title, self.price
+                    settings.MAX_AMAZON_ITEM_PRICE, self.title, self.price
                 )
             )
             return
+        return True
+
+    def is_valid_review_count(self):
         if self.review_count < settings.MIN_AMAZON_ITEM_REVIEW_COUNT:
             logger.info(
                 'Less than minimum item review count {} for item {} with revie'
@@ -163,6 +139,27 @@ class AmazonItem(models.Model):
             return
         return True
 
+    def is_valid_image_list(self):
+        image_list = json.loads(self.image_list)
+        if len(image_list) < settings.MIN_AMAZON_ITEM_IMAGE_COUNT:
+            logger.info(
+                'Less than minimum item image count {} for item {} with image '
+                'count of {}'.format(
+                    settings.MIN_AMAZON_ITEM_IMAGE_COUNT, self.title,
+                    len(image_list)
+                )
+            )
+            return
+        return True
+
+    def is_valid(self):
+        return all(
+            is_valid() for is_valid in [
+                self.is_valid_price, self.is_valid_review_count,
+                self.is_valid_image_list
+            ]
+        )
+
     def __str__(self):
         return self.title
 
@@ -225,5 +222,37 @@ class EbayItem(models.Model):
     get_error.short_description = 'error'
     get_error.allow_tags = True
 
+    def get_status(self):
+        if self.is_listed:
+            return STATUS_LISTED
+        if self.error is not None:
+            return STATUS_ERROR
+        if self.is_ready:
+            return STATUS_READY
+        return STATUS_DRAFTED
+
+    def save(self, *args, **kwargs):
+        super(EbayItem, self).save(*args, **kwargs)
+        AmazonItem.objects.filter(id=self.item_id).update(
+            status=self.get_status()
+        )
+
     def __str__(self):
         return self.title
+
+
+@python_2_unicode_compatible
+class EbayCategory(models.Model):
+
+    category_id = models.IntegerField(primary_key=True)
+    parent_id = models.IntegerField(db_index=True)
+    name = models.TextField()
+    level = models.PositiveSmallIntegerField()
+    is_leaf = models.BooleanField(default=False)
+    version = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name_plural = 'ebay categories'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,124 @@
+import hashlib
+import logging
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import Q
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .utils import Cache
+
+logger = logging.getLogger(__name__)
+
+
+class EstimatedCountPaginator(Paginator):
+
+    def __init__(self, *args, **kwargs):
+        super(EstimatedCountPaginator, self).__init__(*args, **kwargs)
+        self.cache = Cache(
+            settings.PAGINATOR_CACHE_NAME, settings.PAGINATOR_CACHE_TIMEOUT,
+            settings.PAGINATOR_CACHE_MAX_SIZE
+        )
+        self.query_key = hashlib.md5(
+            str(self.object_list.query).encode('utf-8')
+        ).hexdigest()
+        self.is_exact_count = False
+
+    def get_estimated_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            count = self.get_estimated_count()
+            if count > settings.PAGINATOR_EXACT_COUNT_THRESHOLD:
+                return count
+        key = u'count:{}'.format(self.query_key)
+        count = self.cache.get(key)
+        if count is not None:
+            return count
+        count = self.object_list.count()
+        self.is_exact_count = True
+        if count > settings.PAGINATOR_EXACT_COUNT_THRESHOLD:
+            self.cache.set(key, count)
+        return count
+
+
+class KeysetPaginator(EstimatedCountPaginator):
+
+    ordering = ['-id']
+
+    def get_page_key(self, number):
+        return u'page:{}:{}'.format(self.query_key, number)
+
+    def get_seek_filter(self, pk):
+        field_name_list = [
+            field_name.lstrip('-') for field_name in self.ordering
+        ]
+        value_list = self.object_list.model.objects.filter(pk=pk).values_list(
+            *field_name_list
+        )[0]
+        seek_filter = Q()
+        bound_filter = Q()
+        equal_dict = {}
+        for field_name, value in zip(self.ordering, value_list):
+            lookup = 'lt' if field_name.startswith('-') else 'gt'
+            field_name = field_name.lstrip('-')
+            seek_filter |= Q(
+                **dict(equal_dict, **{
+                    '{}__{}'.format(field_name, lookup): value
+                })
+            )
+            if not equal_dict:
+                bound_filter = Q(**{
+                    '{}__{}e'.format(field_name, lookup): value
+                })
+            equal_dict[field_name] = value
+        return bound_filter & seek_filter
+
+    def get_offset_object_list(self, number):
+        if not self.is_exact_count or number * 2 <= self.num_pages:
+            return list(
+                super(KeysetPaginator, self).page(number).object_list
+            )
+        tail_offset = self.count - number * self.per_page
+        size = self.per_page + min(tail_offset, 0)
+        tail_offset = max(tail_offset, 0)
+        object_list = list(
+            self.object_list.reverse()[tail_offset:tail_offset + size]
+        )
+        return object_list[::-1]
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if list(self.object_list.query.order_by) != self.ordering:
+            return super(KeysetPaginator, self).page(number)
+        pk = None
+        if number > 1:
+            pk = self.cache.get(self.get_page_key(number - 1))
+        if pk is None:
+            object_list = self.get_offset_object_list(number)
+        else:
+            try:
+                object_list = list(
+                    self.object_list.filter(self.get_seek_filter(pk))[
+                        :self.per_page
+                    ]
+                )
+            except IndexError:
+                object_list = self.get_offset_object_list(number)
+        if object_list:
+            self.cache.set(self.get_page_key(number), object_list[-1].pk)
+        return Page(object_list, number, self)
+
+
+class AmazonItemPaginator(KeysetPaginator):
+
+    ordering = ['-date_added', '-id']
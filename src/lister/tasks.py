@@ -1,38 +1,145 @@
 import traceback
 
-from celery import shared_task
+from celery import group, shared_task
 from celery.utils.log import get_task_logger
 
-from .utils import Amazon, Ebay
+from django.conf import settings
+
+from .models import AmazonSearch, AmazonItem, EbayItem
+from .utils import Amazon, Ebay, EbayCallLimiter
 
 logger = get_task_logger(__name__)
 
 
 @shared_task(bind=True)
-def search_task(self, queryset):
+def search_task(self, search_id):
+    try:
+        search_obj = AmazonSearch.objects.get(id=search_id)
+        logger.info(
+            'Starting Amazon search task for query {}'.format(search_obj.query)
+        )
+        amazon = Amazon()
+        if not amazon.connection:
+            return 0
+        amazon.search(search_obj)
+        return amazon.total_count
+    except:
+        logger.error(traceback.format_exc())
+        return 0
+
+
+@shared_task(bind=True)
+def search_total_task(self, count_list, search_id_list):
+    total_count = sum(count_list)
+    logger.info(
+        'Saved total of {} Amazon items for {} searches'.format(
+            total_count, len(count_list)
+        )
+    )
+    category_prewarm_task.delay(search_id_list)
+    return total_count
+
+
+@shared_task(bind=True, soft_time_limit=settings.CATEGORY_SEARCH_TIMEOUT)
+def category_search_task(self, query):
+    try:
+        return Ebay().category_search(query)
+    except:
+        logger.error(traceback.format_exc())
+        return []
+
+
+@shared_task(bind=True)
+def category_prewarm_task(self, search_id_list):
+    try:
+        ebay = Ebay()
+        if not ebay.connection:
+            return
+        query_list = AmazonSearch.objects.filter(
+            id__in=search_id_list, amazonitem__isnull=False,
+            amazonitem__ebayitem__isnull=True
+        ).values_list('query', flat=True).distinct()
+        count = 0
+        for query in query_list:
+            try:
+                ebay.category_search(query)
+                count += 1
+            except:
+                logger.error(traceback.format_exc())
+        logger.info(
+            'Prewarmed suggested categories for {} queries'.format(count)
+        )
+    except:
+        logger.error(traceback.format_exc())
+
+
+@shared_task(bind=True)
+def refresh_task(self, item_id_list):
     try:
-        logger.info('Starting Amazon search task')
+        logger.info(
+            'Starting Amazon refresh task for {} items'.format(
+                len(item_id_list)
+            )
+        )
         amazon = Amazon()
         if not amazon.connection:
             return
-        for search_obj in queryset:
-            amazon.search(search_obj)
+        amazon.refresh(AmazonItem.objects.filter(id__in=item_id_list))
         logger.info(
-            'Saved total of {} Amazon items'.format(amazon.total_count)
+            'Updated total of {} Amazon items'.format(amazon.total_count)
         )
     except:
         logger.error(traceback.format_exc())
 
 
 @shared_task(bind=True)
-def list_task(self, queryset):
+def list_task(self, item_id_list):
     try:
-        logger.info('Starting Ebay list task')
+        ebay_item_id_list = list(
+            EbayItem.objects.filter(
+                item_id__in=item_id_list, is_listed=False,
+                item__is_listable=True
+            ).values_list('id', flat=True)
+        )
+        group(
+            list_item_task.s(ebay_item_id)
+            for ebay_item_id in ebay_item_id_list
+        ).apply_async()
+        logger.info(
+            'Dispatched {} Ebay list item tasks'.format(len(ebay_item_id_list))
+        )
+    except:
+        logger.error(traceback.format_exc())
+
+
+@shared_task(bind=True, max_retries=None)
+def list_item_task(self, item_id):
+    limiter = EbayCallLimiter()
+    try:
+        countdown = limiter.acquire()
+    except Exception as exc:
+        logger.error(traceback.format_exc())
+        logger.warning(
+            'Failed to acquire Ebay call limit, retrying Ebay item {} in {}'
+            's'.format(item_id, settings.EBAY_LIST_RETRY_DELAY)
+        )
+        raise self.retry(exc=exc, countdown=settings.EBAY_LIST_RETRY_DELAY)
+    if countdown:
+        logger.info(
+            'Ebay call limit reached, retrying Ebay item {} in {}s'.format(
+                item_id, countdown
+            )
+        )
+        raise self.retry(countdown=countdown)
+    try:
+        item_obj = EbayItem.objects.select_related('item').get(id=item_id)
+        if item_obj.is_listed or not item_obj.item.is_listable:
+            return
         ebay = Ebay()
-        if not (ebay.sandbox_connection or ebay.production_connection):
+        if not ebay.connection:
             return
-        for item_obj in queryset:
-            ebay.list(item_obj.ebayitem_set.all()[0])
-        logger.info('Listed total of {} Ebay items'.format(ebay.total_count))
+        ebay.list(item_obj)
     except:
         logger.error(traceback.format_exc())
+    finally:
+        limiter.release()
@@ -0,0 +1,88 @@
+import re
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import AmazonSearch, AmazonItem, EbayItem
+from .utils import Cache
+
+
+class AmazonItemAdminTestCase(TestCase):
+
+    def setUp(self):
+        cache_settings = self.settings(
+            PAGINATOR_CACHE_NAME='test:paginator:{}'.format(uuid.uuid4().hex)
+        )
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.addCleanup(
+            Cache(settings.PAGINATOR_CACHE_NAME, 0, 0).clear
+        )
+        user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(user)
+        self.search_obj = AmazonSearch.objects.create(query='test')
+        self.item_count = 0
+
+    def add_items(self, count):
+        for _ in range(count):
+            self.item_count += 1
+            item_obj = AmazonItem.objects.create(
+                search=self.search_obj,
+                url='http://www.amazon.com/dp/{}'.format(self.item_count),
+                title='Item {}'.format(self.item_count),
+                feature_list='[]',
+                image_list='["http://www.example.com/image.jpg"]',
+                price=10,
+                review_count=10
+            )
+            EbayItem.objects.create(
+                item=item_obj,
+                title=item_obj.title,
+                price=item_obj.price,
+                html='',
+                category_search='test',
+                category_id=1,
+                category_name='Test',
+                manufacturer='Test',
+                mpn='Test',
+                is_ready=self.item_count % 2 == 0,
+                error='Error' if self.item_count % 3 == 0 else None
+            )
+
+    def get_changelist(self):
+        response = self.client.get(
+            reverse('admin:lister_amazonitem_changelist')
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def get_row_status(self, response, title):
+        match = re.search(
+            r'>{}</a></th>.*?<td class="field-status">(.*?)</td>'.format(
+                re.escape(title)
+            ),
+            response.content.decode('utf-8'), re.DOTALL
+        )
+        self.assertIsNotNone(match)
+        return match.group(1)
+
+    def test_changelist_query_count(self):
+        self.add_items(1)
+        self.get_changelist()
+        with CaptureQueriesContext(connection) as context:
+            self.get_changelist()
+        self.add_items(50)
+        with self.assertNumQueries(len(context)):
+            response = self.get_changelist()
+        self.assertContains(response, 'Item 51')
+        self.assertEqual(self.get_row_status(response, 'Item 1'), 'Drafted')
+        self.assertEqual(self.get_row_status(response, 'Item 2'), 'Ready')
+        self.assertEqual(self.get_row_status(response, 'Item 3'), 'Error')
+        self.assertEqual(self.get_row_status(response, 'Item 6'), 'Error')
@@ -1,69 +1,834 @@
+import bisect
+import hashlib
+import itertools
 import json
 import re
 import logging
+import struct
+import threading
+import time
 import traceback
+import uuid
+from collections import Counter, defaultdict
 from io import BytesIO
+from multiprocessing.pool import ThreadPool
 
+import redis
 import requests
 from amazon.api import AmazonAPI
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 from ebaysdk.trading import Connection as Trading
 from PIL import Image
 
 from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.six.moves import queue
+from django.utils.six.moves.urllib.parse import urlparse
 
-from .models import AmazonItem
+from .models import AmazonSearch, AmazonItem, EbayCategory
 
 logger = logging.getLogger(__name__)
 
+redis_connection = None
+http_client = None
+image_pool = None
+lock = threading.Lock()
+host_semaphore_dict = {}
+category_index = None
+category_index_checked = 0
+category_index_lock = threading.Lock()
+listing_template = None
+ebay_connection_local = threading.local()
+ebay_connection_stats = {'count': 0, 'created': 0, 'total': 0.0, 'max': 0.0}
 
-class Amazon(object):
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+REVIEW_COUNT_PATTERN = re.compile('[0-9,]+ customer reviews')
+REVIEW_COUNT_BYTES_PATTERN = re.compile(br'([0-9,]+)\s+customer reviews')
+
+JPEG_SOF_MARKERS = set(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+
+TOKEN_BUCKET_SCRIPT = '''
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'timestamp')
+local tokens = tonumber(bucket[1]) or capacity
+local timestamp = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - timestamp) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'timestamp', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return wait
+'''
+
+SLOT_LEASE_SCRIPT = '''
+local now = tonumber(ARGV[1])
+local timeout = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + timeout, ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(timeout))
+return 1
+'''
+
+
+def get_redis():
+    global redis_connection
+    if redis_connection is None:
+        redis_connection = redis.StrictRedis.from_url(settings.REDIS_URL)
+    return redis_connection
+
+
+def get_http_client():
+    global http_client
+    with lock:
+        if http_client is None:
+            http_client = HttpClient()
+        return http_client
+
+
+def normalize_query(query):
+    return u' '.join(query.lower().split())
+
+
+def get_token_list(text):
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1
+    ]
+
+
+def get_category_index():
+    global category_index, category_index_checked
+    with category_index_lock:
+        now = time.time()
+        interval = settings.CATEGORY_INDEX_CHECK_INTERVAL
+        if now - category_index_checked < interval:
+            return category_index
+        try:
+            version = EbayCategory.objects.aggregate(
+                Max('version')
+            )['version__max']
+            if category_index is None or category_index.version != version:
+                category_index = CategoryIndex(
+                    version, EbayCategory.objects.values_list(
+                        'category_id', 'parent_id', 'name', 'is_leaf'
+                    )
+                )
+                logger.info(
+                    u'Built Ebay category index version {} with {} categori'
+                    'es'.format(version, len(category_index.name_dict))
+                )
+            category_index_checked = now
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(u'Failed to build Ebay category index')
+            if category_index is None:
+                return CategoryIndex(None, [])
+        return category_index
+
+
+def get_listing_template():
+    global listing_template
+    if listing_template is None:
+        with lock:
+            if listing_template is None:
+                listing_template = get_template(settings.LISTING_TEMPLATE_NAME)
+    return listing_template
+
+
+def get_ebay_connection():
+    start = time.time()
+    environment = 'sandbox' if settings.USE_SANDBOX else 'production'
+    connection = getattr(ebay_connection_local, environment, None)
+    created = connection is None
+    if created:
+        if settings.USE_SANDBOX:
+            connection = Trading(
+                domain='api.sandbox.ebay.com',
+                devid=settings.EBAY_SANDBOX_DEVID,
+                appid=settings.EBAY_SANDBOX_APPID,
+                certid=settings.EBAY_SANDBOX_CERTID,
+                token=settings.EBAY_SANDBOX_TOKEN, config_file=None
+            )
+        else:
+            connection = Trading(
+                devid=settings.EBAY_PRODUCTION_DEVID,
+                appid=settings.EBAY_PRODUCTION_APPID,
+                certid=settings.EBAY_PRODUCTION_CERTID,
+                token=settings.EBAY_PRODUCTION_TOKEN, config_file=None
+            )
+        setattr(ebay_connection_local, environment, connection)
+        logger.info(u'Established Ebay {} API connection'.format(environment))
+    setup_time = time.time() - start
+    with lock:
+        ebay_connection_stats['count'] += 1
+        ebay_connection_stats['created'] += int(created)
+        ebay_connection_stats['total'] += setup_time
+        ebay_connection_stats['max'] = max(
+            ebay_connection_stats['max'], setup_time
+        )
+    logger.info(
+        u'Ebay {} API connection setup took {:.4f}s, stats: {}'.format(
+            environment, setup_time, ebay_connection_stats
+        )
+    )
+    return connection
+
+
+def get_image_pool():
+    global image_pool
+    with lock:
+        if image_pool is None:
+            image_pool = ThreadPool(settings.IMAGE_PROBE_POOL_SIZE)
+        return image_pool
+
+
+def get_host_semaphore(url):
+    host = urlparse(url).netloc
+    with lock:
+        if host not in host_semaphore_dict:
+            host_semaphore_dict[host] = threading.BoundedSemaphore(
+                settings.IMAGE_PROBE_CONCURRENCY_PER_HOST
+            )
+        return host_semaphore_dict[host]
+
+
+def bulk_update(model, obj_list, field_name_list):
+    quote_name = connection.ops.quote_name
+    pk_field = model._meta.pk
+    field_list = [model._meta.get_field(name) for name in field_name_list]
+    column_list = [quote_name(field.column) for field in field_list]
+    set_sql = ', '.join(
+        '{0} = v.{0}::{1}'.format(column, field.db_type(connection))
+        for column, field in zip(column_list, field_list)
+    )
+    row_sql = '({})'.format(', '.join(['%s'] * (len(field_list) + 1)))
+    batch_size = settings.BULK_UPDATE_BATCH_SIZE
+    with connection.cursor() as cursor:
+        for index in range(0, len(obj_list), batch_size):
+            batch = obj_list[index:index + batch_size]
+            params = []
+            for obj in batch:
+                params.append(obj.pk)
+                params.extend(
+                    field.get_db_prep_save(
+                        getattr(obj, field.attname), connection
+                    )
+                    for field in field_list
+                )
+            cursor.execute(
+                'UPDATE {table} AS t SET {set_sql} FROM (VALUES {values}) AS '
+                'v({pk}, {columns}) WHERE t.{pk} = v.{pk}'.format(
+                    table=quote_name(model._meta.db_table),
+                    set_sql=set_sql,
+                    values=', '.join([row_sql] * len(batch)),
+                    pk=quote_name(pk_field.column),
+                    columns=', '.join(column_list),
+                ),
+                params
+            )
+    return len(obj_list)
+
+
+def bulk_create_ignore(model, obj_list, conflict_field_name):
+    quote_name = connection.ops.quote_name
+    pk_field = model._meta.pk
+    field_list = [
+        field for field in model._meta.concrete_fields
+        if field is not pk_field
+    ]
+    row_sql = '({})'.format(', '.join(['%s'] * len(field_list)))
+    batch_size = settings.BULK_CREATE_BATCH_SIZE
+    created_list = []
+    with connection.cursor() as cursor:
+        for index in range(0, len(obj_list), batch_size):
+            batch = obj_list[index:index + batch_size]
+            params = []
+            for obj in batch:
+                params.extend(
+                    field.get_db_prep_save(
+                        field.pre_save(obj, True), connection
+                    ) for field in field_list
+                )
+            cursor.execute(
+                'INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT '
+                '({conflict}) DO NOTHING RETURNING {pk}, {conflict}'.format(
+                    table=quote_name(model._meta.db_table),
+                    columns=', '.join(
+                        quote_name(field.column) for field in field_list
+                    ),
+                    values=', '.join([row_sql] * len(batch)),
+                    conflict=quote_name(
+                        model._meta.get_field(conflict_field_name).column
+                    ),
+                    pk=quote_name(pk_field.column),
+                ),
+                params
+            )
+            pk_dict = {value: pk for pk, value in cursor.fetchall()}
+            for obj in batch:
+                value = getattr(obj, conflict_field_name)
+                if value in pk_dict:
+                    obj.pk = pk_dict[value]
+                    created_list.append(obj)
+    return created_list
+
+
+def reconcile_result_counts():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE lister_amazonsearch SET result_count = c.count '
+            'FROM (SELECT s.id, COUNT(i.id) AS count '
+            'FROM lister_amazonsearch s '
+            'LEFT JOIN lister_amazonitem i ON i.search_id = s.id '
+            'GROUP BY s.id) c '
+            'WHERE c.id = lister_amazonsearch.id '
+            'AND lister_amazonsearch.result_count <> c.count'
+        )
+        return cursor.rowcount
+
+
+def get_image_size(data):
+    data = bytearray(data)
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) >= 24:
+            return struct.unpack('>II', bytes(data[16:24]))
+        return
+    if data[:6] in [b'GIF87a', b'GIF89a']:
+        if len(data) >= 10:
+            return struct.unpack('<HH', bytes(data[6:10]))
+        return
+    if data[:2] != b'\xff\xd8':
+        return
+    index = 2
+    while index + 9 <= len(data):
+        if data[index] != 0xff:
+            return
+        marker = data[index + 1]
+        if marker == 0xff:
+            index += 1
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(
+                '>HH', bytes(data[index + 5:index + 9])
+            )
+            return width, height
+        elif marker == 0x01 or 0xd0 <= marker <= 0xd8:
+            index += 2
+        else:
+            index += 2 + struct.unpack(
+                '>H', bytes(data[index + 2:index + 4])
+            )[0]
+
+
+class CategoryIndex(object):
+
+    def __init__(self, version, category_list):
+        self.version = version
+        parent_dict = {}
+        name_dict = {}
+        leaf_list = []
+        for category_id, parent_id, name, is_leaf in category_list:
+            parent_dict[category_id] = parent_id
+            name_dict[category_id] = name
+            if is_leaf:
+                leaf_list.append(category_id)
+        self.name_dict = {}
+        self.token_dict = defaultdict(set)
+        for category_id in leaf_list:
+            self.name_dict[category_id] = name_dict[category_id]
+            path_id = category_id
+            while True:
+                for token in get_token_list(name_dict.get(path_id, '')):
+                    self.token_dict[token].add(category_id)
+                if parent_dict.get(path_id, path_id) == path_id:
+                    break
+                path_id = parent_dict[path_id]
+        self.token_list = sorted(self.token_dict)
+
+    def get_category_id_set(self, token):
+        category_id_set = set()
+        index = bisect.bisect_left(self.token_list, token)
+        while index < len(self.token_list) and \
+                self.token_list[index].startswith(token):
+            category_id_set |= self.token_dict[self.token_list[index]]
+            index += 1
+        return category_id_set
+
+    def search(self, query, limit):
+        score_counter = Counter()
+        for token in set(get_token_list(query)):
+            score_counter.update(self.get_category_id_set(token))
+        category_id_list = sorted(
+            score_counter, key=lambda category_id: (
+                -score_counter[category_id],
+                len(self.name_dict[category_id]), category_id
+            )
+        )[:limit]
+        return [
+            (category_id, self.name_dict[category_id])
+            for category_id in category_id_list
+        ]
+
+
+class HttpClient(object):
 
     def __init__(self):
+        retry = Retry(
+            total=settings.HTTP_RETRY_COUNT,
+            backoff_factor=settings.HTTP_RETRY_BACKOFF_FACTOR,
+            status_forcelist=[429, 500, 502, 503, 504]
+        )
+        adapter = HTTPAdapter(
+            pool_connections=settings.HTTP_POOL_CONNECTIONS,
+            pool_maxsize=settings.HTTP_POOL_MAXSIZE, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.stats_dict = {}
+
+    def add_latency(self, host, latency):
+        with self.lock:
+            stats = self.stats_dict.setdefault(
+                host, {'count': 0, 'total': 0.0, 'max': 0.0}
+            )
+            stats['count'] += 1
+            stats['total'] += latency
+            stats['max'] = max(stats['max'], latency)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                host: {
+                    'count': stats['count'],
+                    'average': stats['total'] / stats['count'],
+                    'max': stats['max'],
+                }
+                for host, stats in self.stats_dict.items()
+            }
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', (
+            settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT
+        ))
+        start = time.time()
         try:
-            self.connection = AmazonAPI(
-                settings.AMAZON_ACCESS_KEY, settings.AMAZON_SECRET_KEY,
-                settings.AMAZON_ASSOCIATE_TAG
+            return self.session.get(url, **kwargs)
+        finally:
+            self.add_latency(urlparse(url).netloc, time.time() - start)
+
+
+class Cache(object):
+
+    def __init__(self, name, timeout, max_size):
+        self.name = name
+        self.timeout = timeout
+        self.max_size = max_size
+        self.lru_key = '{}:lru'.format(name)
+        self.hits_key = '{}:hits'.format(name)
+        self.misses_key = '{}:misses'.format(name)
+
+    def get_key(self, key):
+        return u'{}:key:{}'.format(self.name, key)
+
+    def get_many(self, key_list):
+        if not key_list:
+            return {}
+        try:
+            connection = get_redis()
+            value_list = connection.mget([self.get_key(k) for k in key_list])
+            value_dict = {
+                key: json.loads(value.decode('utf-8'))
+                for key, value in zip(key_list, value_list)
+                if value is not None
+            }
+            now = time.time()
+            pipeline = connection.pipeline()
+            for key in value_dict:
+                pipeline.zadd(self.lru_key, now, key)
+            pipeline.incrby(self.hits_key, len(value_dict))
+            pipeline.incrby(self.misses_key, len(key_list) - len(value_dict))
+            pipeline.execute()
+            return value_dict
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(u'Failed to read from {} cache'.format(self.name))
+            return {}
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, value_dict):
+        if not value_dict:
+            return
+        try:
+            connection = get_redis()
+            now = time.time()
+            pipeline = connection.pipeline()
+            for key, value in value_dict.items():
+                pipeline.setex(
+                    self.get_key(key), self.timeout, json.dumps(value)
+                )
+                pipeline.zadd(self.lru_key, now, key)
+            pipeline.zremrangebyscore(self.lru_key, 0, now - self.timeout)
+            pipeline.zcard(self.lru_key)
+            excess = pipeline.execute()[-1] - self.max_size
+            if excess > 0:
+                key_list = [
+                    key.decode('utf-8')
+                    for key in connection.zrange(self.lru_key, 0, excess - 1)
+                ]
+                pipeline.delete(*[self.get_key(key) for key in key_list])
+                pipeline.zrem(self.lru_key, *key_list)
+                pipeline.execute()
+                logger.info(
+                    u'Evicted {} keys from {} cache'.format(excess, self.name)
+                )
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(u'Failed to write to {} cache'.format(self.name))
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def clear(self):
+        connection = get_redis()
+        key_list = [
+            self.get_key(key.decode('utf-8'))
+            for key in connection.zrange(self.lru_key, 0, -1)
+        ]
+        connection.delete(
+            self.lru_key, self.hits_key, self.misses_key, *key_list
+        )
+
+    def get_stats(self):
+        connection = get_redis()
+        hits, misses = connection.mget([self.hits_key, self.misses_key])
+        return {
+            'hits': int(hits or 0),
+            'misses': int(misses or 0),
+            'size': connection.zcard(self.lru_key),
+        }
+
+
+class RateLimiter(object):
+
+    def __init__(self, name, rate, capacity):
+        self.key = '{}:bucket'.format(name)
+        self.rate = rate
+        self.capacity = capacity
+        self.script = None
+
+    def acquire(self):
+        if self.script is None:
+            self.script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        while True:
+            wait = self.script(
+                keys=[self.key], args=[self.rate, self.capacity, time.time()]
             )
-            logger.info(u'Established Amazon API connection')
+            if not wait:
+                return
+            logger.info(
+                u'Waiting {}ms for rate limiter {}'.format(wait, self.key)
+            )
+            time.sleep(wait / 1000.0)
+
+
+class AmazonRequestCoalescer(object):
+
+    def __init__(self):
+        self.limiter = RateLimiter(
+            'amazon_api', settings.AMAZON_API_RATE, settings.AMAZON_API_BURST
+        )
+
+    def get_keys(self, cache_url):
+        digest = hashlib.sha1(cache_url.encode('utf-8')).hexdigest()
+        return (
+            'amazon_api:response:{}'.format(digest),
+            'amazon_api:lock:{}'.format(digest),
+        )
+
+    def read(self, cache_url):
+        try:
+            connection = get_redis()
+            response_key, lock_key = self.get_keys(cache_url)
+            deadline = time.time() + settings.AMAZON_API_COALESCE_TIMEOUT
+            while time.time() < deadline:
+                response_text = connection.get(response_key)
+                if response_text is not None:
+                    logger.info(
+                        u'Coalesced Amazon API request {}'.format(cache_url)
+                    )
+                    return response_text
+                if connection.set(
+                    lock_key, 1, nx=True,
+                    ex=settings.AMAZON_API_COALESCE_LOCK_TIMEOUT
+                ):
+                    break
+                time.sleep(0.1)
+            self.limiter.acquire()
         except:
-            self.connection = None
             logger.error(traceback.format_exc())
-            logger.error(u'Failed to establish Amazon API connection')
-        self.total_count = 0
+            logger.warning(u'Failed to throttle Amazon API request')
+
+    def write(self, cache_url, response_text):
+        try:
+            response_key, lock_key = self.get_keys(cache_url)
+            pipeline = get_redis().pipeline()
+            pipeline.setex(
+                response_key, settings.AMAZON_API_COALESCE_WINDOW,
+                response_text
+            )
+            pipeline.delete(lock_key)
+            pipeline.execute()
+        except:
+            logger.error(traceback.format_exc())
+
+
+class ImageProber(object):
+
+    def __init__(self):
+        self.cache = Cache(
+            'image_size', settings.IMAGE_SIZE_CACHE_TIMEOUT,
+            settings.IMAGE_SIZE_CACHE_MAX_SIZE
+        )
+        self.size_dict = {}
+        self.byte_count = 0
+        self.lock = threading.Lock()
+
+    def add_byte_count(self, count):
+        with self.lock:
+            self.byte_count += count
+
+    def get_partial_size(self, url):
+        range_size = settings.IMAGE_PROBE_RANGE_SIZE
+        response = get_http_client().get(
+            url, headers={'Range': 'bytes=0-{}'.format(range_size - 1)},
+            stream=True
+        )
+        data = b''
+        try:
+            if not response.ok:
+                logger.info(
+                    u'Range request for image size from url {} failed with st'
+                    'atus {}'.format(url, response.status_code)
+                )
+                return
+            for chunk in response.iter_content(1024):
+                data += chunk
+                size = get_image_size(data)
+                if size:
+                    return size
+                if len(data) >= range_size:
+                    break
+        finally:
+            response.close()
+            self.add_byte_count(len(data))
+
+    def get_full_size(self, url):
+        response = get_http_client().get(url)
+        self.add_byte_count(len(response.content))
+        return Image.open(BytesIO(response.content)).size
+
+    def get_size(self, url):
+        with get_host_semaphore(url):
+            try:
+                size = self.get_partial_size(url)
+                if size:
+                    return size
+                logger.info(
+                    u'Falling back to full download for image size from url'
+                    ' {}'.format(url)
+                )
+                return self.get_full_size(url)
+            except:
+                logger.error(traceback.format_exc())
+                logger.warning(
+                    u'Failed to get image size from url {}'.format(url)
+                )
+                return 0, 0
+
+    def probe(self, url_list):
+        new_url_list = [
+            url for url in set(url_list) if url not in self.size_dict
+        ]
+        cache_dict = self.cache.get_many(new_url_list)
+        for url, (width, height, _) in cache_dict.items():
+            self.size_dict[url] = width, height
+        new_url_list = [
+            url for url in new_url_list if url not in self.size_dict
+        ]
+        if new_url_list:
+            size_list = get_image_pool().map(self.get_size, new_url_list)
+            self.size_dict.update(zip(new_url_list, size_list))
+            now = time.time()
+            self.cache.set_many({
+                url: [width, height, now]
+                for url, (width, height) in zip(new_url_list, size_list)
+                if width and height
+            })
+        return [self.size_dict[url] for url in url_list]
+
+
+class ReviewCountProvider(object):
+
+    def __init__(self):
+        self.cache = Cache(
+            'review_count', settings.REVIEW_COUNT_CACHE_TIMEOUT,
+            settings.REVIEW_COUNT_CACHE_MAX_SIZE
+        )
+
+    def fetch_review_count(self, review_url):
+        raise NotImplementedError
+
+    def load_review_count(self, title, url, review_url):
+        try:
+            count = self.fetch_review_count(review_url)
+        except:
+            logger.error(traceback.format_exc())
+            return
+        if count is None:
+            logger.warning(
+                u'Review count for Amazon item {} from url {} not foun'
+                'd'.format(title, url)
+            )
+            return
+        logger.info(
+            u'Review count for Amazon item {} from url {} is {}'.format(
+                title, url, count
+            )
+        )
+        self.cache.set(url, count)
+        return count
 
     def get_review_count(self, title, url, has_review, review_url):
         if not has_review:
             return 0
-        try:
-            response = requests.get(review_url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            count = soup.find(string=re.compile('[0-9,]+ customer reviews'))
-            count = int(count.split()[0].replace(',', ''))
+        count = self.cache.get(url)
+        if count is not None:
             logger.info(
-                u'Review count for Amazon item {} from url {} is {}'.format(
-                    title, url, count
-                )
+                u'Cached review count for Amazon item {} from url {} is'
+                ' {}'.format(title, url, count)
             )
             return count
-        except AttributeError:
-            logger.warning(
-                u'Review count for Amazon item {} from url {} not foun'
-                'd'.format(title, url)
-                )
+        count = self.load_review_count(title, url, review_url)
+        if count is None:
             return 0
+        return count
+
+
+class SoupReviewCountProvider(ReviewCountProvider):
+
+    def fetch_review_count(self, review_url):
+        response = get_http_client().get(review_url)
+        soup = BeautifulSoup(response.content, 'html.parser')
+        count = soup.find(string=REVIEW_COUNT_PATTERN)
+        if count:
+            return int(count.split()[0].replace(',', ''))
+
+
+class StreamReviewCountProvider(ReviewCountProvider):
+
+    def fetch_review_count(self, review_url):
+        response = get_http_client().get(review_url, stream=True)
+        data = b''
+        try:
+            for chunk in response.iter_content(
+                settings.REVIEW_COUNT_CHUNK_SIZE
+            ):
+                data = data[-64:] + chunk
+                match = REVIEW_COUNT_BYTES_PATTERN.search(data)
+                if match:
+                    return int(match.group(1).replace(b',', b''))
+        finally:
+            response.close()
+
+
+class ListingRenderer(object):
+
+    def __init__(self):
+        self.template = get_listing_template()
+        self.cache = Cache(
+            'listing_html', settings.LISTING_HTML_CACHE_TIMEOUT,
+            settings.LISTING_HTML_CACHE_MAX_SIZE
+        )
+
+    def get_key(self, item_obj):
+        return u'{}:{}'.format(item_obj.pk, settings.LISTING_TEMPLATE_VERSION)
+
+    def render(self, item_obj):
+        return self.template.render({
+            'title': item_obj.title,
+            'feature_list': json.loads(item_obj.feature_list),
+        })
+
+    def render_many(self, item_obj_list):
+        key_dict = {
+            self.get_key(item_obj): item_obj for item_obj in item_obj_list
+        }
+        html_dict = self.cache.get_many(list(key_dict))
+        missing_dict = {
+            key: self.render(item_obj)
+            for key, item_obj in key_dict.items() if key not in html_dict
+        }
+        self.cache.set_many(missing_dict)
+        html_dict.update(missing_dict)
+        return {
+            item_obj.pk: html_dict[key] for key, item_obj in key_dict.items()
+        }
+
+    def get_html(self, item_obj):
+        return self.render_many([item_obj])[item_obj.pk]
+
+
+class Amazon(object):
+
+    def __init__(self):
+        try:
+            coalescer = AmazonRequestCoalescer()
+            self.connection = AmazonAPI(
+                settings.AMAZON_ACCESS_KEY, settings.AMAZON_SECRET_KEY,
+                settings.AMAZON_ASSOCIATE_TAG, CacheReader=coalescer.read,
+                CacheWriter=coalescer.write
+            )
+            logger.info(u'Established Amazon API connection')
         except:
+            self.connection = None
             logger.error(traceback.format_exc())
-            return 0
+            logger.error(u'Failed to establish Amazon API connection')
+        self.prober = ImageProber()
+        self.review_count_provider = import_string(
+            settings.REVIEW_COUNT_PROVIDER
+        )()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.skip_counter = Counter()
+        self.total_count = 0
+
+    def get_image_url_list(self, result):
+        return [str(image.LargeImage.URL) for image in result.images]
 
     def get_image_list(self, result):
         image_list = []
-        for url in [str(image.LargeImage.URL) for image in result.images]:
-            response = requests.get(url)
-            image = Image.open(BytesIO(response.content))
-            height, width = image.size
-            if height >= 500 and width >= 500:
+        url_list = self.get_image_url_list(result)
+        size_list = self.prober.probe(url_list)
+        for url, (width, height) in zip(url_list, size_list):
+            if width >= 500 and height >= 500:
                 image_list.append(url)
         logger.info(
             u'Got {} images for Amazon item {}'.format(
@@ -72,132 +837,512 @@ class Amazon(object):
         )
         return json.dumps(image_list)
 
+    def add_skip_count(self, reason, review_count, image_count):
+        with self.lock:
+            self.skip_counter[reason] += 1
+            self.skip_counter['avoided_review_fetches'] += review_count
+            self.skip_counter['avoided_image_fetches'] += image_count
+
+    def get_url(self, result):
+        return '/'.join(result.offer_url.split('/')[:-1])
+
+    def get_price(self, result):
+        return result.price_and_currency[0] or result.list_price[0] or 0
+
+    def exclude_saved_results(self, results):
+        url_list = [self.get_url(result) for result in results]
+        url_set = set(
+            AmazonItem.objects.filter(url__in=url_list).values_list(
+                'url', flat=True
+            )
+        )
+        new_results = []
+        for url, result in zip(url_list, results):
+            if url not in url_set:
+                url_set.add(url)
+                new_results.append(result)
+        skip_count = len(results) - len(new_results)
+        if skip_count:
+            with self.lock:
+                self.skip_counter['saved'] += skip_count
+            logger.info(
+                u'Skipped {} already saved Amazon items'.format(skip_count)
+            )
+        return new_results
+
     def parse_result(self, result, search_obj):
-        url = '/'.join(result.offer_url.split('/')[:-1])
+        url = self.get_url(result)
         title = result.title
-        feature_list = json.dumps(result.features)
-        image_list = self.get_image_list(result)
-        price = result.price_and_currency[0] or result.list_price[0] or 0
-        manufacturer = result.manufacturer
-        mpn = result.mpn
-        review_count = self.get_review_count(title, url, *result.reviews)
-        item = {
-            'search': search_obj,
-            'url': url,
-            'title': title,
-            'feature_list': feature_list,
-            'image_list': image_list,
-            'price': price,
-            'manufacturer': manufacturer,
-            'mpn': mpn,
-            'review_count': review_count,
-        }
+        item_obj = AmazonItem(
+            search=search_obj,
+            url=url,
+            title=title,
+            feature_list=json.dumps(result.features),
+            price=self.get_price(result),
+            manufacturer=result.manufacturer,
+            mpn=result.mpn,
+        )
+        has_review = result.reviews[0]
+        image_count = len(result.images)
+        if not item_obj.is_valid_price():
+            self.add_skip_count('price', int(bool(has_review)), image_count)
+            return
+        if self.stop_event.is_set():
+            return
+        item_obj.review_count = self.review_count_provider.get_review_count(
+            title, url, *result.reviews
+        )
+        if not item_obj.is_valid_review_count():
+            self.add_skip_count('review_count', 0, image_count)
+            return
+        if self.stop_event.is_set():
+            return
+        item_obj.image_list = self.get_image_list(result)
+        if not item_obj.is_valid_image_list():
+            self.add_skip_count('image_list', 0, 0)
+            return
         message = 'Parsed Amazon item:\n'
-        for key, value in item.items():
-            message += '{}: {}\n'.format(key.upper(), value)
+        for field in [
+            'url', 'title', 'feature_list', 'image_list', 'price',
+            'manufacturer', 'mpn', 'review_count'
+        ]:
+            message += '{}: {}\n'.format(
+                field.upper(), getattr(item_obj, field)
+            )
         logger.info(message.strip())
-        return item
+        return item_obj
 
-    def search(self, search_obj):
+    def parse_result_safe(self, result, search_obj):
+        if self.stop_event.is_set():
+            return
         try:
-            results = self.connection.search(
-                Keywords=search_obj.query, SearchIndex='All'
+            return self.parse_result(result, search_obj)
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(
+                u'Failed to parse Amazon item: {}'.format(result.title)
             )
-            results = list(reversed(list(results)))
-            logger.info(
-                u'Got {} search results from Amazon API for query {}'.format(
-                    len(results), search_obj.query
+
+    def sort_results(self, results):
+        if settings.AMAZON_SEARCH_ORDER == 'reverse':
+            return results[::-1]
+        if settings.AMAZON_SEARCH_ORDER == 'price':
+            return sorted(results, key=self.get_price)
+        return results
+
+    def iterate_results(self, search_obj):
+        try:
+            result_iter = iter(
+                self.connection.search(
+                    Keywords=search_obj.query,
+                    SearchIndex=settings.AMAZON_SEARCH_INDEX
                 )
             )
         except:
-            results = []
             logger.error(traceback.format_exc())
-            logger.warning(
-                u'Got 0 search results from Amazon API for query {}'.format(
-                    search_obj.query
+            return
+        for page in range(1, settings.AMAZON_SEARCH_MAX_PAGES + 1):
+            try:
+                results = list(
+                    itertools.islice(
+                        result_iter, settings.AMAZON_SEARCH_PAGE_SIZE
+                    )
                 )
+            except:
+                logger.error(traceback.format_exc())
+                logger.warning(
+                    u'Failed to get page {} of search results from Amazon API'
+                    ' for query {}'.format(page, search_obj.query)
+                )
+                return
+            logger.info(
+                u'Got {} search results from Amazon API for query {} on pag'
+                'e {}'.format(len(results), search_obj.query, page)
             )
-        search_obj.date_searched = timezone.now()
-        search_obj.save()
-        count = 0
-        for result in results:
-            if count > settings.MAX_AMAZON_ITEM_COUNT_PER_SEARCH:
-                logger.info(
-                    u'Reached maximum Amazon item count per search limit'
+            if not results:
+                return
+            for result in self.exclude_saved_results(
+                self.sort_results(results)
+            ):
+                yield result
+
+    def refresh_item(self, item_obj, result):
+        has_review, review_url = result.reviews
+        review_count = 0
+        if has_review:
+            review_count = self.review_count_provider.load_review_count(
+                item_obj.title, item_obj.url, review_url
+            )
+        image_list = self.get_image_list(result)
+        if any(
+            self.prober.size_dict.get(url) == (0, 0)
+            for url in self.get_image_url_list(result)
+        ):
+            image_list = None
+        changed = False
+        for field_name, value in [
+            ('price', self.get_price(result)),
+            ('review_count', review_count),
+            ('image_list', image_list),
+        ]:
+            if value is None:
+                logger.warning(
+                    u'Kept {} of Amazon item {} after failed refresh'.format(
+                        field_name, item_obj.title
+                    )
                 )
-                break
-            result = self.parse_result(result, search_obj)
-            item_obj = AmazonItem(**result)
-            if item_obj.is_valid():
+            elif value != getattr(item_obj, field_name):
+                setattr(item_obj, field_name, value)
+                changed = True
+        is_listable = bool(item_obj.is_valid())
+        if is_listable != item_obj.is_listable:
+            item_obj.is_listable = is_listable
+            changed = True
+            logger.info(
+                u'Marked Amazon item {} as {}listable'.format(
+                    item_obj.title, '' if is_listable else 'not '
+                )
+            )
+        if not changed:
+            return
+        logger.info(u'Refreshed Amazon item {}'.format(item_obj.title))
+        return item_obj
+
+    def refresh_item_safe(self, args):
+        try:
+            return self.refresh_item(*args)
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(
+                u'Failed to refresh Amazon item {}'.format(args[0].title)
+            )
+
+    def refresh(self, queryset):
+        item_obj_dict = {
+            item_obj.get_asin(): item_obj for item_obj in queryset
+        }
+        asin_list = list(item_obj_dict)
+        batch_size = settings.AMAZON_LOOKUP_BATCH_SIZE
+        changed_list = []
+        pool = ThreadPool(settings.AMAZON_SEARCH_FAN_OUT)
+        try:
+            for index in range(0, len(asin_list), batch_size):
+                batch = asin_list[index:index + batch_size]
                 try:
-                    item_obj.save()
-                    logger.info(
-                        u'Saved amazon item: {}'.format(item_obj.title)
-                    )
-                    count += 1
+                    results = self.connection.lookup(ItemId=','.join(batch))
                 except:
                     logger.error(traceback.format_exc())
                     logger.warning(
-                        u'Failed to save amazon item: {}'.format(
-                            item_obj.title
-                        )
+                        u'Failed to look up Amazon items {}'.format(batch)
                     )
+                    continue
+                if not isinstance(results, list):
+                    results = [results]
+                changed_list.extend(
+                    item_obj for item_obj in pool.map(
+                        self.refresh_item_safe, [
+                            (item_obj_dict[result.asin], result)
+                            for result in results
+                            if result.asin in item_obj_dict
+                        ]
+                    ) if item_obj
+                )
+        finally:
+            pool.close()
+            pool.join()
+        count = bulk_update(
+            AmazonItem, changed_list,
+            ['price', 'review_count', 'image_list', 'is_listable']
+        )
         logger.info(
-            u'Saved {} amazon items for query {}'.format(
-                count, search_obj.query
+            u'Updated {} of {} refreshed Amazon items'.format(
+                count, len(item_obj_dict)
             )
         )
         self.total_count += count
 
+    def search(self, search_obj):
+        item_obj_list = []
+        max_count = settings.MAX_AMAZON_ITEM_COUNT_PER_SEARCH
+        self.stop_event.clear()
+        pool = ThreadPool(settings.AMAZON_SEARCH_FAN_OUT)
+        done_queue = queue.Queue()
+        result_iter = self.iterate_results(search_obj)
 
-class Ebay(object):
+        def schedule(result_count):
+            scheduled_count = 0
+            for result in itertools.islice(result_iter, result_count):
+                pool.apply_async(
+                    self.parse_result_safe, [result, search_obj],
+                    callback=done_queue.put
+                )
+                scheduled_count += 1
+            return scheduled_count
 
-    def __init__(self):
         try:
-            self.production_connection = Trading(
-                devid=settings.EBAY_PRODUCTION_DEVID,
-                appid=settings.EBAY_PRODUCTION_APPID,
-                certid=settings.EBAY_PRODUCTION_CERTID,
-                token=settings.EBAY_PRODUCTION_TOKEN, config_file=None
+            pending_count = schedule(settings.AMAZON_SEARCH_FAN_OUT)
+            while pending_count:
+                item_obj = done_queue.get()
+                pending_count -= 1
+                if item_obj and not self.stop_event.is_set():
+                    item_obj_list.append(item_obj)
+                    if len(item_obj_list) >= max_count:
+                        logger.info(
+                            u'Reached maximum Amazon item count per search '
+                            'limit'
+                        )
+                        self.stop_event.set()
+                if not self.stop_event.is_set():
+                    pending_count += schedule(1)
+        finally:
+            self.stop_event.set()
+            pool.close()
+            pool.join()
+        try:
+            created_list = bulk_create_ignore(AmazonItem, item_obj_list, 'url')
+        except:
+            created_list = []
+            logger.error(traceback.format_exc())
+        count = len(created_list)
+        try:
+            ListingRenderer().render_many(created_list)
+        except:
+            logger.error(traceback.format_exc())
+            logger.warning(u'Failed to pre-render listing html')
+        search_obj.date_searched = timezone.now()
+        AmazonSearch.objects.filter(id=search_obj.id).update(
+            date_searched=search_obj.date_searched,
+            result_count=F('result_count') + count
+        )
+        logger.info(
+            u'Saved {} of {} valid amazon items for query {}'.format(
+                count, len(item_obj_list), search_obj.query
             )
-            logger.info(u'Established Ebay Production API connection')
-            self.sandbox_connection = Trading(
-                domain='api.sandbox.ebay.com',
-                devid=settings.EBAY_SANDBOX_DEVID,
-                appid=settings.EBAY_SANDBOX_APPID,
-                certid=settings.EBAY_SANDBOX_CERTID,
-                token=settings.EBAY_SANDBOX_TOKEN, config_file=None
+        )
+        logger.info(
+            u'Downloaded {} bytes of image data for {} images'.format(
+                self.prober.byte_count, len(self.prober.size_dict)
+            )
+        )
+        logger.info(
+            u'Rejected Amazon items and avoided fetches: {}'.format(
+                dict(self.skip_counter)
+            )
+        )
+        logger.info(
+            u'HTTP latency stats: {}'.format(get_http_client().get_stats())
+        )
+        try:
+            logger.info(
+                u'Image size cache stats: {}'.format(
+                    self.prober.cache.get_stats()
+                )
             )
-            logger.info(u'Established Ebay Sandbox API connection')
         except:
-            self.production_connection = self.sandbox_connection = None
+            logger.error(traceback.format_exc())
+        self.total_count += count
+
+
+class EbayCallLimiter(object):
+
+    def __init__(self):
+        self.name = 'ebay_api:{}'.format(
+            'sandbox' if settings.USE_SANDBOX else 'production'
+        )
+        self.slot_key = '{}:slots'.format(self.name)
+        self.token = None
+
+    def acquire_slot(self):
+        token = uuid.uuid4().hex
+        script = get_redis().register_script(SLOT_LEASE_SCRIPT)
+        if script(keys=[self.slot_key], args=[
+            time.time(), settings.EBAY_LIST_CONCURRENCY,
+            settings.EBAY_LIST_SLOT_TIMEOUT, token
+        ]):
+            self.token = token
+            return True
+
+    def acquire_budget(self):
+        connection = get_redis()
+        pipeline = connection.pipeline()
+        now = time.time()
+        budget_key_list = []
+        try:
+            for period, limit in [
+                (60 * 60, settings.EBAY_HOURLY_CALL_LIMIT),
+                (60 * 60 * 24, settings.EBAY_DAILY_CALL_LIMIT),
+            ]:
+                budget_key = '{}:budget:{}:{}'.format(
+                    self.name, period, int(now // period)
+                )
+                pipeline.incr(budget_key)
+                pipeline.expire(budget_key, period)
+                budget_key_list.append(budget_key)
+                if pipeline.execute()[0] > limit:
+                    for key in budget_key_list:
+                        pipeline.decr(key)
+                    pipeline.execute()
+                    return int(period - now % period) + 1
+        except:
+            try:
+                for key in budget_key_list:
+                    pipeline.decr(key)
+                pipeline.execute()
+            except:
+                logger.error(traceback.format_exc())
+            raise
+
+    def acquire(self):
+        if not self.acquire_slot():
+            return settings.EBAY_LIST_RETRY_DELAY
+        try:
+            countdown = self.acquire_budget()
+        except:
+            self.release()
+            raise
+        if countdown:
+            self.release()
+        return countdown
+
+    def release(self):
+        if self.token is None:
+            return
+        try:
+            get_redis().zrem(self.slot_key, self.token)
+        except:
+            logger.error(traceback.format_exc())
+        self.token = None
+
+
+class Ebay(object):
+
+    def __init__(self):
+        try:
+            self.connection = get_ebay_connection()
+        except:
+            self.connection = None
             logger.error(traceback.format_exc())
             logger.error(u'Failed to establish Ebay API connection')
+        self.limiter = EbayCallLimiter()
+        self.category_cache = Cache(
+            'ebay_category', settings.CATEGORY_CACHE_TIMEOUT,
+            settings.CATEGORY_CACHE_MAX_SIZE
+        )
         self.total_count = 0
 
-    def category_search(self, query):
-        response = self.production_connection.execute(
-            'GetSuggestedCategories', {'Query': query}
+    def execute(self, verb, data):
+        countdown = self.limiter.acquire_budget()
+        if countdown:
+            logger.warning(
+                u'Ebay call budget exhausted for {}, next call allowed in {}'
+                's'.format(verb, countdown)
+            )
+            return
+        return self.connection.execute(verb, data)
+
+    def get_category_version(self):
+        response = self.execute('GetCategories', {'CategorySiteID': 0})
+        if response is not None:
+            return int(response.dict()['CategoryVersion'])
+
+    def sync_categories(self, force=False):
+        version = self.get_category_version()
+        if version is None:
+            return 0
+        local_version = EbayCategory.objects.aggregate(
+            Max('version')
+        )['version__max']
+        if version == local_version and not force:
+            logger.info(
+                u'Ebay category version {} is up to date'.format(version)
+            )
+            return 0
+        response = self.execute(
+            'GetCategories', {
+                'CategorySiteID': 0, 'DetailLevel': 'ReturnAll',
+                'ViewAllNodes': 'true',
+            }
         )
-        response = response.dict()
+        if response is None:
+            return 0
+        category_list = response.dict()['CategoryArray']['Category']
+        category_obj_list = [
+            EbayCategory(
+                category_id=int(c['CategoryID']),
+                parent_id=int(c['CategoryParentID']),
+                name=c['CategoryName'],
+                level=int(c['CategoryLevel']),
+                is_leaf=c.get('LeafCategory') == 'true',
+                version=version,
+            )
+            for c in category_list
+        ]
+        with transaction.atomic():
+            EbayCategory.objects.all().delete()
+            EbayCategory.objects.bulk_create(
+                category_obj_list, batch_size=settings.BULK_CREATE_BATCH_SIZE
+            )
         logger.info(
-            u'Got {} suggested categories for query {}'.format(
-                response['SuggestedCategoryArray']['SuggestedCategory'],
-                query
+            u'Synced {} Ebay categories from version {} to {}'.format(
+                len(category_obj_list), local_version, version
             )
         )
-        return [
+        return len(category_obj_list)
+
+    def get_stored_categories(self, query):
+        query = normalize_query(query)
+        if settings.USE_LOCAL_CATEGORIES:
+            index = get_category_index()
+            category_list = index.search(query, settings.CATEGORY_SEARCH_LIMIT)
+            if category_list:
+                logger.info(
+                    u'Got {} local suggested categories for query {}'.format(
+                        len(category_list), query
+                    )
+                )
+                return category_list
+        category_list = self.category_cache.get(query)
+        if category_list is not None:
+            logger.info(
+                u'Got {} cached suggested categories for query {}'.format(
+                    len(category_list), query
+                )
+            )
+            return [tuple(category) for category in category_list]
+
+    def category_search(self, query):
+        category_list = self.get_stored_categories(query)
+        if category_list is not None:
+            return category_list
+        if not self.connection:
+            return []
+        query = normalize_query(query)
+        response = self.execute('GetSuggestedCategories', {'Query': query})
+        if response is None:
+            return []
+        response = response.dict()
+        suggested_list = (response.get('SuggestedCategoryArray') or {}).get(
+            'SuggestedCategory', []
+        )
+        if isinstance(suggested_list, dict):
+            suggested_list = [suggested_list]
+        category_list = [
             (int(c['Category']['CategoryID']), c['Category']['CategoryName'])
-            for c in response['SuggestedCategoryArray']['SuggestedCategory']
+            for c in suggested_list
         ]
+        logger.info(
+            u'Got {} suggested categories for query {}'.format(
+                len(category_list), query
+            )
+        )
+        self.category_cache.set(query, category_list)
+        return category_list
 
     def list(self, item_obj):
         if settings.USE_SANDBOX:
-            connection = self.sandbox_connection
             url = 'http://cgi.sandbox.ebay.com/ws/eBayISAPI.dll?ViewItem&item'\
                 '={}&ssPageName=STRK:MESELX:IT'
         else:
-            connection = self.produiction_connection
             url = 'http://www.ebay.com/itm/-/{}?ssPageName=ADME:L:LCA:US:1123'
         item_dict = {
             'Item': {
@@ -253,7 +1398,9 @@ class Ebay(object):
                 },
             }
         try:
-            response = connection.execute('AddFixedPriceItem', item_dict)
+            response = self.connection.execute(
+                'AddFixedPriceItem', item_dict
+            )
             logger.info(u'Listed Ebay item {}'.format(item_obj.title))
             item_obj.url = url.format(response.dict()['ItemID'])
             item_obj.is_listed = True
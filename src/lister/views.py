@@ -1,15 +1,58 @@
-from django.http import HttpResponse
+from celery.result import AsyncResult
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+
+from .tasks import category_search_task
 from .utils import Ebay
 
+TASK_ID_LIST_SESSION_KEY = 'category_search_task_id_list'
+
+
+def add_task_id(request, task_id):
+    task_id_list = request.session.get(TASK_ID_LIST_SESSION_KEY, [])
+    task_id_list.append(task_id)
+    request.session[TASK_ID_LIST_SESSION_KEY] = task_id_list[
+        -settings.CATEGORY_SEARCH_SESSION_TASK_COUNT:
+    ]
+
+
+def remove_task_id(request, task_id):
+    task_id_list = request.session.get(TASK_ID_LIST_SESSION_KEY, [])
+    if task_id not in task_id_list:
+        raise Http404
+    task_id_list.remove(task_id)
+    request.session[TASK_ID_LIST_SESSION_KEY] = task_id_list
 
+
+@staff_member_required
 def category_search_view(request, query=None):
-    ebay = Ebay()
-    if not (request.is_ajax() and query and ebay.production_connection):
-        return HttpResponse()
-    options = ''
-    for category_id, category_name in ebay.category_search(query):
-        options += u'<option value="{}">{}</option>\n'.format(
-            category_id, category_name
-        )
-    return HttpResponse(options.strip())
+    if not (request.is_ajax() and query):
+        return JsonResponse({'status': 'done', 'category_list': []})
+    category_list = Ebay().get_stored_categories(query)
+    if category_list is not None:
+        return JsonResponse({'status': 'done', 'category_list': category_list})
+    task = category_search_task.delay(query)
+    add_task_id(request, task.id)
+    return JsonResponse({'status': 'pending', 'task_id': task.id})
+
+
+@staff_member_required
+def category_result_view(request, task_id):
+    if task_id not in request.session.get(TASK_ID_LIST_SESSION_KEY, []):
+        raise Http404
+    result = AsyncResult(task_id)
+    if not result.ready():
+        return JsonResponse({'status': 'pending', 'task_id': task_id})
+    remove_task_id(request, task_id)
+    category_list = result.result if result.successful() else []
+    result.forget()
+    return JsonResponse({'status': 'done', 'category_list': category_list})
+
+
+@staff_member_required
+def category_cancel_view(request, task_id):
+    remove_task_id(request, task_id)
+    AsyncResult(task_id).revoke()
+    return JsonResponse({'status': 'cancelled', 'task_id': task_id})
@@ -1,24 +1,74 @@
 django.jQuery(document).ready(function($) {
 
+  var POLL_INTERVAL = 500;
+  var SEARCH_TIMEOUT = 10000;
+  var searchCounter = 0;
+  var searchRequest = null;
+  var searchTaskId = null;
+
   $('#id_ebayitem_set-0-title').bind('keydown keyup', function () {
     $('#id_ebayitem_set-0-title + .help').html($('#id_ebayitem_set-0-title').val().length + ' characters');
   });
 
   $('#id_ebayitem_set-0-category_search').after('<button id="search_button" type="button">Search</button>');
 
-  if ($('#id_ebayitem_set-0-category_id option:selected').length == 0) {
-    $.get('/search/' + $('#id_ebayitem_set-0-category_search').val(), function(data) {
-      $('#id_ebayitem_set-0-category_id').html(data);
-      $('#id_ebayitem_set-0-category_name').val($('#id_ebayitem_set-0-category_id option:first').text());
+  function cancelSearch() {
+    if (searchRequest) {
+      searchRequest.abort();
+      searchRequest = null;
+    }
+    if (searchTaskId) {
+      $.get('/search/cancel/' + searchTaskId + '/');
+      searchTaskId = null;
+    }
+  }
+
+  function showCategories(categoryList) {
+    var select = $('#id_ebayitem_set-0-category_id').empty();
+    $.each(categoryList, function (index, category) {
+      select.append($('<option>').val(category[0]).text(category[1]));
     });
+    $('#id_ebayitem_set-0-category_name').val($('#id_ebayitem_set-0-category_id option:first').text());
+  }
+
+  function handleSearch(searchId, deadline, data) {
+    if (searchId != searchCounter) {
+      return;
+    }
+    searchRequest = null;
+    if (data.status == 'done') {
+      searchTaskId = null;
+      showCategories(data.category_list);
+    } else if (new Date().getTime() > deadline) {
+      cancelSearch();
+    } else {
+      searchTaskId = data.task_id;
+      setTimeout(function () {
+        if (searchId != searchCounter) {
+          return;
+        }
+        searchRequest = $.get('/search/result/' + searchTaskId + '/', function (data) {
+          handleSearch(searchId, deadline, data);
+        });
+      }, POLL_INTERVAL);
+    }
   }
 
-  $('#search_button').bind('click', function () {
-    $.get('/search/' + $('#id_ebayitem_set-0-category_search').val(), function(data) {
-        $('#id_ebayitem_set-0-category_id').html(data);
-        $('#id_ebayitem_set-0-category_name').val($('#id_ebayitem_set-0-category_id option:first').text());
+  function search() {
+    var query = $('#id_ebayitem_set-0-category_search').val();
+    var searchId = ++searchCounter;
+    var deadline = new Date().getTime() + SEARCH_TIMEOUT;
+    cancelSearch();
+    searchRequest = $.get('/search/' + encodeURIComponent(query), function (data) {
+      handleSearch(searchId, deadline, data);
     });
-  });
+  }
+
+  if ($('#id_ebayitem_set-0-category_id option:selected').length == 0) {
+    search();
+  }
+
+  $('#search_button').bind('click', search);
 
   $('#id_ebayitem_set-0-category_id').bind('click', function () {
     $('#id_ebayitem_set-0-category_name').val($('#id_ebayitem_set-0-category_id option:selected').text());